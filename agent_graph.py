@@ -0,0 +1,110 @@
+"""The ReAct agent graph, compiled once and shared by every session.
+
+Everything that differs between turns (chat model, system prompt,
+temperature, language) is passed per invocation in the run config, so
+switching styles neither recompiles the graph nor loses the conversation
+kept by the checkpointer.
+"""
+import asyncio
+
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.graph import StateGraph, START, END, MessagesState
+from langgraph.prebuilt import ToolNode
+
+import settings
+from history import prepare_history
+
+DEFAULT_TEMPERATURE = 0.5
+
+
+class AgentState(MessagesState):
+    # Running summary of turns that were dropped to stay within the token budget
+    summary: str
+    # Token accounting of the last model call (see history.prepare_history)
+    history_report: dict
+
+
+def turn_config(thread_id, llm, system_prompt, temperature=DEFAULT_TEMPERATURE, language="en"):
+    """Run config for one turn of the conversation `thread_id`."""
+    # Grouped in one dict on purpose: LangGraph copies plain string and number
+    # configurable values into the metadata of every checkpoint, which would
+    # store the whole system prompt again at each step.
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "turn": {
+                "llm": llm,
+                "system_prompt": system_prompt,
+                "temperature": temperature,
+                "language": language,
+            },
+        }
+    }
+
+
+def build_agent(tools_by_language, checkpointer, history_budget=None, tool_output_chars=None):
+    """Compile the agent graph.
+
+    `tools_by_language` maps a language code to the tools bound to the model
+    for that language. The variants may only differ in their descriptions:
+    the tool node executes them by name. `history_budget` caps the tokens of
+    history sent per model call (see history.py).
+    """
+    default_tools = next(iter(tools_by_language.values()))
+    history_budget = history_budget or settings.HISTORY_TOKEN_BUDGET
+    tool_output_chars = tool_output_chars or settings.HISTORY_TOOL_OUTPUT_CHARS
+
+    # Define the nodes
+    def prepare(state, config):
+        turn = config["configurable"]["turn"]
+        tools = tools_by_language.get(turn["language"], default_tools)
+        # System prompt (plus the running summary) first, then the trimmed history
+        messages_with_prompt, update, report = prepare_history(
+            state['messages'],
+            state.get('summary', ""),
+            turn["system_prompt"],
+            turn["llm"],
+            history_budget,
+            tool_output_chars,
+        )
+        model = turn["llm"].bind_tools(tools).bind(temperature=turn["temperature"])
+        update["history_report"] = report
+        return model, messages_with_prompt, update
+
+    def call_model(state: AgentState, config: RunnableConfig):
+        model, messages_with_prompt, update = prepare(state, config)
+        response = model.invoke(messages_with_prompt)
+        update["messages"] = update.get("messages", []) + [response]
+        return update
+
+    async def acall_model(state: AgentState, config: RunnableConfig):
+        # History trimming may summarize with a blocking model call.
+        model, messages_with_prompt, update = await asyncio.to_thread(prepare, state, config)
+        response = await model.ainvoke(messages_with_prompt)
+        update["messages"] = update.get("messages", []) + [response]
+        return update
+
+    def should_continue(state: AgentState):
+        last_message = state['messages'][-1]
+        if last_message.tool_calls:
+            return "tools"
+        return END
+
+    # Define the graph
+    workflow = StateGraph(AgentState)
+
+    # Sync and async variants: invoke/stream use the first, ainvoke/astream the second.
+    workflow.add_node("agent", RunnableLambda(call_model, afunc=acall_model, name="agent"))
+    workflow.add_node("tools", ToolNode(default_tools))
+
+    workflow.add_edge(START, "agent")
+
+    workflow.add_conditional_edges(
+        "agent",
+        should_continue,
+        ["tools", END]
+    )
+
+    workflow.add_edge("tools", "agent")
+
+    return workflow.compile(checkpointer=checkpointer)
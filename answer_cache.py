@@ -0,0 +1,81 @@
+"""Semantic cache of final answers to first-turn questions.
+
+Questions are embedded with the same sentence-transformers model as the
+knowledge base; a new question whose cosine similarity to a cached one is
+above the threshold, within the same scope, is answered from the cache
+without calling the LLM.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    def __init__(self, embeddings, threshold=0.92, maxsize=512, ttl=86400.0):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # scope -> OrderedDict[question, (created, unit vector, answer)]
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, entries):
+        if not self.ttl:
+            return
+        now = time.monotonic()
+        for question in [q for q, (created, _, _) in entries.items() if now - created > self.ttl]:
+            del entries[question]
+
+    def lookup(self, question, scope):
+        """Return (answer, similarity) of the closest cached question, or (None, best similarity)."""
+        vector = self._embed(question)
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries:
+                self._expire(entries)
+            if not entries:
+                self.misses += 1
+                return None, 0.0
+
+            questions = list(entries)
+            matrix = np.stack([entries[q][1] for q in questions])
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None, float(scores[best])
+
+            entries.move_to_end(questions[best])
+            self.hits += 1
+            return entries[questions[best]][2], float(scores[best])
+
+    def store(self, question, scope, answer):
+        vector = self._embed(question)
+        with self._lock:
+            entries = self._scopes.setdefault(scope, OrderedDict())
+            entries[question] = (time.monotonic(), vector, answer)
+            entries.move_to_end(question)
+            while sum(len(e) for e in self._scopes.values()) > self.maxsize:
+                # Evict the least recently used entry of the largest scope.
+                largest = max(self._scopes.values(), key=len)
+                largest.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": sum(len(e) for e in self._scopes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
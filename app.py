@@ -1,18 +1,17 @@
 import streamlit as st
+import hashlib
+import logging
 import os
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_groq import ChatGroq
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import StateGraph, START, END, MessagesState
-from langgraph.prebuilt import ToolNode
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from translations import TRANSLATIONS
+import settings
+from warmup import IndexWarmup, serve_health
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 # --- Configuration and Initialization ---
 # Set page config
@@ -36,6 +35,100 @@ def load_custom_css():
 
 load_custom_css()
 
+# --- Index Warm-up ---
+# The embedding model and index are loaded in a background thread from the
+# first script run of the process, while the user picks a language and types
+# a question; the first question then waits on that same load (if it is still
+# running) instead of starting its own.
+class IndexLoader:
+    """The process's embedding model, index server client and index warm-up.
+
+    Created once by get_warmup(); the warm-up thread has no ScriptRunContext,
+    so it only calls these plain methods, which import what they need and make
+    no Streamlit calls.
+    """
+
+    def __init__(self):
+        self.embeddings = None
+        self.client = None
+        self._lock = threading.Lock()
+        self.warmup = IndexWarmup(self.load, self.corpus_key, settings.CORPUS_CHECK_INTERVAL)
+
+    def get_client(self):
+        with self._lock:
+            if self.client is None:
+                import index_client
+
+                self.client = index_client.IndexServerClient()
+        return self.client
+
+    def get_embeddings(self):
+        # One embedding model per process, shared by the index and the answer cache;
+        # none at all when an index server provides it.
+        if settings.INDEX_SERVER_URL:
+            import index_client
+
+            client = self.get_client()
+            with self._lock:
+                if self.embeddings is None:
+                    self.embeddings = index_client.RemoteEmbeddings(client)
+            return self.embeddings
+        with self._lock:
+            if self.embeddings is None:
+                import telemetry
+                import vector_index
+
+                embeddings = vector_index.get_embeddings()
+                if hasattr(embeddings, "stats"):
+                    telemetry.register("query_batches", embeddings.stats)
+                self.embeddings = embeddings
+        return self.embeddings
+
+    def load(self):
+        import telemetry
+
+        with telemetry.span("load_vectorstore"):
+            if settings.INDEX_SERVER_URL:
+                import index_client
+
+                return index_client.connect(client=self.get_client())
+            import vector_index
+
+            return vector_index.load_index(
+                embeddings=self.get_embeddings(),
+                sync=not settings.INDEX_READ_ONLY
+            )
+
+    def corpus_key(self):
+        # A new load (sync) is needed when the PDFs, or the index server's version, change.
+        if settings.INDEX_SERVER_URL:
+            return self.get_client().info().get("version")
+        import vector_index
+
+        return vector_index.corpus_fingerprint()
+
+@st.cache_resource(show_spinner=False)
+def get_index_loader():
+    loader = IndexLoader()
+    if settings.HEALTH_PORT:
+        # The port is per process: a second app process on the host (or any
+        # other listener) keeps it, and this one warms up without endpoints.
+        # Raising here would not be cached and would fail every script run.
+        try:
+            serve_health(loader.warmup)
+        except OSError as e:
+            logger.warning("health endpoints disabled: cannot listen on port %s: %s", settings.HEALTH_PORT, e)
+    return loader
+
+def get_warmup():
+    return get_index_loader().warmup
+
+def get_embeddings():
+    return get_index_loader().get_embeddings()
+
+if settings.WARMUP_AT_START:
+    get_warmup().start(refresh=False)
+
 # Language Selection Logic
 if st.session_state.language is None:
     st.markdown("<h1 style='text-align: center;'>Fitness AI Coach 💪</h1>", unsafe_allow_html=True)
@@ -82,25 +175,76 @@ with st.sidebar:
     else:
         st.success(t["api_success"])
     
+    # Polls only while the warm-up runs. run_every is fixed when the fragment is
+    # defined, so when the load finishes one full rerun redefines it without the timer.
+    kb_loading = get_warmup().status()["state"] == "loading"
+    
+    @st.fragment(run_every=2 if kb_loading else None)
+    def knowledge_base_status():
+        status = get_warmup().status()
+        if kb_loading and status["state"] != "loading":
+            st.rerun()
+        if status["state"] == "ready":
+            st.caption(t["kb_status_ready"].format(seconds=status["seconds"]))
+        elif status["state"] == "empty":
+            st.caption(t["kb_status_empty"])
+        elif status["state"] == "failed":
+            st.caption(t["kb_status_failed"].format(error=status["error"]))
+        elif status["state"] == "idle":
+            st.caption(t["kb_status_idle"])
+        else:
+            st.caption(t["kb_status_loading"].format(seconds=status["seconds"] or 0))
+    
+    knowledge_base_status()
+    
     st.markdown("---")
     
     st.header(t["stats"])
-    if "messages" in st.session_state:
-        col1, col2 = st.columns(2)
-        total_messages = len(st.session_state.messages)
-        user_messages = len([m for m in st.session_state.messages if m["role"] == "user"])
-        
-        col1.metric(t["total_messages"], total_messages)
-        col2.metric(t["your_questions"], user_messages)
+    # Filled again after an answer, which is appended without rerunning the page.
+    stats_placeholder = st.empty()
+    
+    def render_stats():
+        if "messages" not in st.session_state:
+            return
+        with stats_placeholder.container():
+            col1, col2 = st.columns(2)
+            total_messages = len(st.session_state.messages)
+            user_messages = sum(1 for m in st.session_state.messages if m["role"] == "user")
+            
+            col1.metric(t["total_messages"], total_messages)
+            col2.metric(t["your_questions"], user_messages)
+    
+    render_stats()
     
     st.markdown("---")
     
     if st.button(t["clear_chat"], use_container_width=True):
         st.session_state.messages = []
+        st.session_state.pop("chat_window", None)
         st.rerun()
     
     st.markdown("---")
 
+    if settings.DEBUG_PANEL:
+        import telemetry
+
+        with st.expander(t["debug_panel"]):
+            metrics = telemetry.snapshot()
+            if metrics["turns"]:
+                st.caption(t["debug_last_turn"])
+                st.json(metrics["turns"][-1], expanded=False)
+            st.caption(t["debug_spans"])
+            st.dataframe(
+                [{"span": name, **summary} for name, summary in sorted(metrics["timings"].items())],
+                hide_index=True,
+                use_container_width=True
+            )
+            st.json(metrics["counters"], expanded=False)
+            st.caption(t["debug_gauges"])
+            st.json(metrics["gauges"], expanded=False)
+
+        st.markdown("---")
+
     # Language Switcher (Expandable)
     with st.expander("🌐 Language / Dil"):
         lang_options = {"tr": "🇹🇷 Türkçe", "en": "🇬🇧 English"}
@@ -124,105 +268,279 @@ with st.sidebar:
     st.markdown("---")
     st.caption(t["powered_by"])
 
-@st.cache_resource(show_spinner=False)
 def load_vectorstore():
-    with st.spinner(t["loading_kb"]):
-        try:
-            loader = PyPDFDirectoryLoader("data/fitness_pdfs/")
-            documents = loader.load()
-            
-            if not documents:
-                st.warning(t["no_pdfs"])
-                return None, 0
-            
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            texts = text_splitter.split_documents(documents)
-            
-            embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2"
-            )
-            vectorstore = Chroma.from_documents(texts, embeddings)
-            
-            # st.success removed from here to prevent caching issue with language
-            return vectorstore, len(documents)
-        except Exception as e:
-            st.error(t["vectorstore_error"].format(error=e))
-            return None, 0
+    """The knowledge base of the current PDFs, waiting for the warm-up if needed."""
+    warmup = get_warmup()
+    try:
+        if warmup.ready:
+            knowledge_base = warmup.get()
+        else:
+            with st.spinner(t["loading_kb"]):
+                knowledge_base = warmup.get()
+    except Exception as e:
+        st.error(t["vectorstore_error"].format(error=e))
+        return None
+
+    if not knowledge_base:
+        import vector_index
+
+        if settings.INDEX_SERVER_URL or vector_index.list_pdfs():
+            st.warning(t["index_not_built"])
+        else:
+            st.warning(t["no_pdfs"])
+        return None
+    return knowledge_base
+
+@st.cache_resource(show_spinner=False)
+def get_retrieval_cache():
+    # Shared by every session and agent; entries are keyed on the index version.
+    cache = RetrievalCache(
+        maxsize=settings.RETRIEVAL_CACHE_SIZE,
+        ttl=settings.RETRIEVAL_CACHE_TTL
+    )
+    telemetry.register("retrieval_cache", cache.stats)
+    return cache
 
 @st.cache_resource(show_spinner=False)
-def create_agent(api_key, system_prompt, temperature=0.5):
-    if not api_key:
+def get_reranker():
+    # The cross-encoder outlives agent rebuilds, and so does its cost estimate.
+    if not settings.RERANK_ENABLED:
         return None
-        
-    vectorstore, doc_count = load_vectorstore()
-    if not vectorstore:
+    from reranking import CrossEncoderReranker
+
+    return CrossEncoderReranker()
+
+
+@st.cache_resource(show_spinner=False)
+def get_answer_cache():
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    cache = SemanticAnswerCache(
+        get_embeddings(),
+        threshold=settings.ANSWER_CACHE_THRESHOLD,
+        maxsize=settings.ANSWER_CACHE_SIZE,
+        ttl=settings.ANSWER_CACHE_TTL
+    )
+    telemetry.register("answer_cache", cache.stats)
+    return cache
+
+def answer_cache_scope(system_prompt, temperature):
+    """Cache scope of a turn, or None (no caching) when no knowledge base is loaded."""
+    knowledge_base = load_vectorstore()
+    if knowledge_base is None:
+        return None
+    # The final system prompt already encodes language, style and thinking mode.
+    prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+    return (st.session_state.language, prompt_hash, temperature, knowledge_base.version)
+
+def is_first_turn():
+    # The current question has already been appended to the history.
+    return len(st.session_state.messages) == 1
+
+def cached_answer(agent, config, prompt, system_prompt, temperature):
+    """Answer a first-turn question from the semantic cache, or return None."""
+    cache = get_answer_cache()
+    if cache is None or not is_first_turn():
         return None
     
-    # Display success message here. Since create_agent re-runs when system_prompt changes 
-    # (which happens when language changes), this ensures the message is in the correct language.
-    st.success(t["pdfs_loaded"].format(count=doc_count))
-    
-    from custom_tools import create_retriever_tool
-    
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+    scope = answer_cache_scope(system_prompt, temperature)
+    if scope is None:
+        return None
+    answer, _ = cache.lookup(prompt, scope)
+    if answer is None:
+        return None
     
-    retriever_tool = create_retriever_tool(
-        retriever,
-        name="fitness_knowledge",
-        description=t["retriever_desc"]
+    # Record the exchange in the agent's memory so follow-up questions still work.
+    agent.update_state(
+        config,
+        {"messages": [HumanMessage(content=prompt), AIMessage(content=answer)]},
+        as_node="agent"
     )
-    
-    llm = ChatGroq(
+    return answer
+
+def remember_answer(prompt, system_prompt, temperature, answer):
+    cache = get_answer_cache()
+    if cache is None or not is_first_turn() or not answer:
+        return
+    scope = answer_cache_scope(system_prompt, temperature)
+    if scope is not None:
+        cache.store(prompt, scope, answer)
+
+@st.cache_resource(show_spinner=False)
+def get_event_loop():
+    # One loop per process: the async Groq client stays bound to it.
+    return EventLoopThread()
+
+@st.cache_resource(show_spinner=False)
+def get_retrieval_executor():
+    # Bounds the concurrent embedding/search work of async tool calls.
+    return ThreadPoolExecutor(max_workers=settings.RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    # One /metrics endpoint per process, shared by every session.
+    return telemetry.serve_prometheus() if settings.TELEMETRY_PORT else None
+
+def trace_turn(config):
+    """Attach a TurnTracer to the run config; returns (config, tracer or None)."""
+    if not settings.TELEMETRY_ENABLED:
+        return config, None
+    tracer = telemetry.TurnTracer(st.session_state.thread_id)
+    return {**config, "callbacks": [tracer]}, tracer
+
+def finish_trace(tracer, answer_cache_hit):
+    if tracer is not None:
+        tracer.finish(answer_cache_hit=answer_cache_hit)
+
+def turn_events(agent, prompt, config):
+    inputs = {"messages": [HumanMessage(content=prompt)]}
+    if settings.AGENT_ASYNC:
+        return get_event_loop().iterate(astream_turn(agent, inputs, config))
+    return stream_turn(agent, inputs, config)
+
+def stream_response(agent, prompt, config, is_thinking_mode=False):
+    """Stream one answer into the current chat message and return the raw response.
+    
+    Tokens are shown as they arrive; in thinking mode the <thinking> part goes
+    into a status box above the answer.
+    """
+    status = st.status(t["thinking_process_streaming"], expanded=True) if is_thinking_mode else None
+    thinking_placeholder = status.empty() if status else None
+    answer_placeholder = st.empty()
+    thinking_text = ""
+    answer_text = ""
+    raw_response = ""
+    render_seconds = 0.0
+    
+    for event, value in turn_events(agent, prompt, config):
+        began = time.perf_counter()
+        if event == "tool":
+            if status:
+                status.write(t["consulting_tool"].format(tool_name=value))
+                status.update(label=t["consulting_tool_status"].format(tool_name=value), state="running")
+        elif event == "new_message":
+            # The previous model message was an intermediate (tool-calling) step
+            answer_text = ""
+            answer_placeholder.empty()
+            if status:
+                thinking_text = ""
+                thinking_placeholder = status.empty()
+        elif event == "thinking":
+            thinking_text += value
+            if status:
+                thinking_placeholder.markdown(thinking_text)
+        elif event == "answer":
+            answer_text += value
+            answer_placeholder.markdown(answer_text + "▌")
+        elif event == "done":
+            raw_response = value
+        render_seconds += time.perf_counter() - began
+    
+    telemetry.observe("ui.stream_render", render_seconds)
+    
+    if status:
+        status.update(label=t["thinking_complete"], state="complete", expanded=False)
+    
+    # Fallback if response is empty
+    if not raw_response:
+        answer_placeholder.markdown(t["error_no_response"])
+        return ""
+    
+    answer_placeholder.markdown(answer_text.strip())
+    return raw_response
+
+def make_message(role, content):
+    """Chat record kept in st.session_state.messages.
+    
+    The <thinking> part is split off once here, so redrawing the history does
+    not parse every message again.
+    """
+    thinking, answer = split_thinking(content) if role == "assistant" else ("", content)
+    return {"role": role, "content": answer, "thinking": thinking}
+
+def render_message_body(message):
+    if message.get("thinking"):
+        with st.expander(f"🧠 {t['thinking_process']}"):
+            st.markdown(message["thinking"])
+    st.markdown(message["content"])
+
+def render_message(message):
+    with st.chat_message(message["role"]):
+        render_message_body(message)
+
+def history_start(messages):
+    """Index of the first message shown: the last `chat_window` messages, from a question on."""
+    window = st.session_state.get("chat_window", settings.CHAT_WINDOW)
+    if not window or len(messages) <= window:
+        return 0
+    start = len(messages) - window
+    if messages[start]["role"] == "assistant":
+        start += 1
+    return start
+
+def show_earlier_messages():
+    st.session_state.chat_window = st.session_state.get("chat_window", settings.CHAT_WINDOW) + settings.CHAT_WINDOW
+
+@st.cache_resource(show_spinner=False)
+def get_checkpointer():
+    # Shared by every session and kept when the agent is rebuilt, so neither a
+    # style change nor a corpus sync drops the conversation history.
+    checkpointer = make_checkpointer()
+    telemetry.register("checkpointer", lambda: checkpointer_stats(checkpointer))
+    return checkpointer
+
+# Keyed on the API key: keep only the clients of the most recently used keys
+# rather than every key ever typed into the process.
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_llm(api_key):
+    # Temperature is bound per turn in the agent graph.
+    return ChatGroq(
         model="openai/gpt-oss-120b",
         groq_api_key=api_key,
-        temperature=temperature
+        temperature=DEFAULT_TEMPERATURE
     )
-    
-    memory = MemorySaver()
-    
-    # Custom ReAct Agent Implementation
-    
-    # Define the state
-    class AgentState(MessagesState):
-        pass
 
-    # Define the nodes
-    def call_model(state: AgentState):
-        messages = state['messages']
-        # Prepend system prompt to ensure instructions are followed
-        messages_with_prompt = [SystemMessage(content=system_prompt)] + messages
-        response = llm.bind_tools([retriever_tool]).invoke(messages_with_prompt)
-        return {"messages": [response]}
-
-    def should_continue(state: AgentState):
-        messages = state['messages']
-        last_message = messages[-1]
-        if last_message.tool_calls:
-            return "tools"
-        return END
-
-    # Define the graph
-    workflow = StateGraph(AgentState)
-    
-    workflow.add_node("agent", call_model)
-    workflow.add_node("tools", ToolNode([retriever_tool]))
-    
-    workflow.add_edge(START, "agent")
-    
-    workflow.add_conditional_edges(
-        "agent",
-        should_continue,
-        ["tools", END]
-    )
-    
-    workflow.add_edge("tools", "agent")
-    
-    # Compile the graph
-    agent = workflow.compile(checkpointer=memory)
+# One compiled graph per process (per index version). Prompt, style and temperature
+# are passed per invocation through turn_config().
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _create_agent(index_version):
+    knowledge_base = load_vectorstore()
+    if not knowledge_base:
+        return None
     
+    if settings.INDEX_SERVER_URL:
+        retriever = knowledge_base.make_retriever()
+    else:
+        retriever = vector_index.make_retriever(knowledge_base, reranker=get_reranker())
+    
+    # Same tool in every language; only the description shown to the model differs.
+    retriever_tools = {
+        language: [create_retriever_tool(
+            retriever,
+            name="fitness_knowledge",
+            description=strings["retriever_desc"],
+            cache=get_retrieval_cache(),
+            cache_version=index_version,
+            context_tokens=settings.RETRIEVAL_CONTEXT_TOKENS,
+            executor=get_retrieval_executor()
+        )]
+        for language, strings in TRANSLATIONS.items()
+    }
+    
+    return build_agent(retriever_tools, get_checkpointer())
+
+def create_agent():
+    # The index version is part of the cache key so that a corpus sync also
+    # rebuilds the agent around the refreshed vector store.
+    knowledge_base = load_vectorstore()
+    if not knowledge_base:
+        return None
+    agent = _create_agent(knowledge_base.version)
+    # Shown here rather than in the cached builder, whose UI calls Streamlit
+    # would replay to every session in the language of the first one.
+    if agent and st.session_state.get("kb_announced") != knowledge_base.version:
+        st.success(t["pdfs_loaded"].format(count=knowledge_base.doc_count))
+        st.session_state.kb_announced = knowledge_base.version
     return agent
 
 if not groq_api_key:
@@ -230,6 +548,23 @@ if not groq_api_key:
     st.info(t["api_info"])
     st.stop()
 
+# --- Agent Stack ---
+# Imported only past the language and API-key screens: LangChain, LangGraph,
+# the Groq client and NumPy take seconds to import in a fresh process, and
+# those screens need none of them. The embedding model and the vector store
+# are imported later still, when the index is first opened.
+from langchain_groq import ChatGroq
+from langchain_core.messages import HumanMessage, AIMessage
+import vector_index
+from custom_tools import RetrievalCache, create_retriever_tool
+from answer_cache import SemanticAnswerCache
+from agent_graph import DEFAULT_TEMPERATURE, build_agent, turn_config
+from checkpointers import checkpointer_stats, make_checkpointer
+from streaming import EventLoopThread, astream_turn, split_thinking, stream_turn
+import telemetry
+
+start_metrics_server()
+
 st.subheader(t["example_questions"])
 col1, col2 = st.columns(2)
 
@@ -254,26 +589,58 @@ if "thread_id" not in st.session_state:
     import uuid
     st.session_state.thread_id = str(uuid.uuid4())
 
+history_began = time.perf_counter()
+first_shown = history_start(st.session_state.messages)
+if first_shown:
+    st.button(
+        t["show_earlier"].format(count=first_shown),
+        on_click=show_earlier_messages,
+        use_container_width=True,
+    )
+for message in st.session_state.messages[first_shown:]:
+    render_message(message)
+telemetry.observe("ui.history", time.perf_counter() - history_began, messages=len(st.session_state.messages) - first_shown)
+
+# A new turn is drawn here, right after the history, whichever widget starts it;
+# the page is not rerun after the answer.
+welcome_placeholder = st.empty()
+if len(st.session_state.messages) == 0:
+    welcome_placeholder.info(t["welcome"])
+turn_container = st.container()
+
 if hasattr(st.session_state, 'example_clicked'):
     prompt = st.session_state.example_clicked
     delattr(st.session_state, 'example_clicked')
     
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    welcome_placeholder.empty()
+    st.session_state.messages.append(make_message("user", prompt))
+    with turn_container.chat_message("user"):
+        st.markdown(prompt)
     
-    with st.chat_message("assistant"):
+    with turn_container.chat_message("assistant"):
         with st.spinner(t["thinking"]):
             # Default style for example questions or use a default
-            temperature = 0.5
-            agent = create_agent(groq_api_key, t["system_prompt"], temperature)
+            temperature = DEFAULT_TEMPERATURE
+            agent = create_agent()
             if agent:
                 try:
-                    config = {"configurable": {"thread_id": st.session_state.thread_id}}
-                    result = agent.invoke(
-                        {"messages": [HumanMessage(content=prompt)]},
-                        config
+                    config = turn_config(
+                        st.session_state.thread_id,
+                        get_llm(groq_api_key),
+                        t["system_prompt"],
+                        temperature,
+                        st.session_state.language
                     )
-                    response = result["messages"][-1].content
-                    st.markdown(response)
+                    config, tracer = trace_turn(config)
+                    response = cached_answer(agent, config, prompt, t["system_prompt"], temperature)
+                    if response is not None:
+                        render_message_body(make_message("assistant", response))
+                        finish_trace(tracer, answer_cache_hit=True)
+                    else:
+                        response = stream_response(agent, prompt, config)
+                        finish_trace(tracer, answer_cache_hit=False)
+                        remember_answer(prompt, t["system_prompt"], temperature, response)
+                        response = response or t["error_no_response"]
                 except Exception as e:
                     response = f"❌ {st.session_state.language.upper()}: {str(e)}"
                     st.error(response)
@@ -281,32 +648,8 @@ if hasattr(st.session_state, 'example_clicked'):
                 response = t["agent_error"]
                 st.error(response)
     
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.rerun()
-
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        content = message["content"]
-        if "<thinking>" in content and "</thinking>" in content:
-            try:
-                start_tag = "<thinking>"
-                end_tag = "</thinking>"
-                start_index = content.find(start_tag) + len(start_tag)
-                end_index = content.find(end_tag)
-                
-                thinking_content = content[start_index:end_index].strip()
-                final_answer = content[end_index + len(end_tag):].strip()
-                
-                with st.expander(f"🧠 {t['thinking_process']}"):
-                    st.markdown(thinking_content)
-                st.markdown(final_answer)
-            except:
-                st.markdown(content)
-        else:
-            st.markdown(content)
-
-if len(st.session_state.messages) == 0:
-    st.info(t["welcome"])
+    st.session_state.messages.append(make_message("assistant", response))
+    render_stats()
 
 # Style Selection (Popover above chat input)
 style_options = {
@@ -407,14 +750,15 @@ with st.container():
                     configure_custom_style(selected)
 
 if prompt := st.chat_input(t["chat_placeholder"]):
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
+    welcome_placeholder.empty()
+    st.session_state.messages.append(make_message("user", prompt))
+    with turn_container.chat_message("user"):
         st.markdown(prompt)
     
-    with st.chat_message("assistant"):
+    with turn_container.chat_message("assistant"):
         with st.spinner(t["thinking"]):
             # Determine style parameters
-            temperature = 0.5
+            temperature = DEFAULT_TEMPERATURE
             style_prompt = ""
             
             # Re-fetch selected style key because it might have changed
@@ -460,78 +804,27 @@ if prompt := st.chat_input(t["chat_placeholder"]):
 
             final_system_prompt = t["system_prompt"] + style_prompt
             
-            agent = create_agent(groq_api_key, final_system_prompt, temperature)
+            agent = create_agent()
             if agent:
                 try:
-                    config = {"configurable": {"thread_id": st.session_state.thread_id}}
+                    config = turn_config(
+                        st.session_state.thread_id,
+                        get_llm(groq_api_key),
+                        final_system_prompt,
+                        temperature,
+                        st.session_state.language
+                    )
+                    config, tracer = trace_turn(config)
+                    response = cached_answer(agent, config, prompt, final_system_prompt, temperature)
                     
-                    if is_thinking_mode:
-                        with st.status(t["thinking_process_streaming"], expanded=True) as status:
-                            response_placeholder = st.empty()
-                            full_response = ""
-                            raw_response = ""
-                            
-                            # Stream the events from the graph
-                            events = agent.stream(
-                                {"messages": [HumanMessage(content=prompt)]},
-                                config,
-                                stream_mode="values"
-                            )
-                            
-                            for event in events:
-                                if "messages" in event:
-                                    last_msg = event["messages"][-1]
-                                    if isinstance(last_msg, AIMessage):
-                                        content = last_msg.content
-                                        
-                                        # Handle tool calls
-                                        if last_msg.tool_calls:
-                                            for tool_call in last_msg.tool_calls:
-                                                status.write(t["consulting_tool"].format(tool_name=tool_call['name']))
-                                                status.update(label=t["consulting_tool_status"].format(tool_name=tool_call['name']), state="running")
-                                        
-                                        # Handle structured thinking content
-                                        if "<thinking>" in content and "</thinking>" in content:
-                                            # Extract thinking part
-                                            start_tag = "<thinking>"
-                                            end_tag = "</thinking>"
-                                            start_index = content.find(start_tag) + len(start_tag)
-                                            end_index = content.find(end_tag)
-                                            
-                                            thinking_content = content[start_index:end_index].strip()
-                                            final_answer = content[end_index + len(end_tag):].strip()
-                                            
-                                            # Update status with the reasoning
-                                            status.write(thinking_content)
-                                            full_response = final_answer
-                                        elif "<thinking>" in content:
-                                            # Partial thinking content (streaming)
-                                            status.write(t["reasoning_streaming"])
-                                            full_response = content # Fallback
-                                        else:
-                                            # No tags found yet or normal response
-                                            full_response = content
-                                        
-                                        # Keep track of the raw content for saving
-                                        raw_response = content
-                                            
-                            status.update(label=t["thinking_complete"], state="complete", expanded=False)
-                            
-                            # Fallback if response is empty
-                            if not raw_response:
-                                full_response = t.get("error_no_response", "⚠️ Bir hata oluştu, cevap üretilemedi.")
-                                raw_response = full_response
-                                
-                            st.markdown(full_response)
-                            response = raw_response
+                    if response is not None:
+                        render_message_body(make_message("assistant", response))
+                        finish_trace(tracer, answer_cache_hit=True)
                     else:
-                        # Standard invoke
-                        result = agent.invoke(
-                            {"messages": [HumanMessage(content=prompt)]},
-                            config
-                        )
-                        response = result["messages"][-1].content
-                        st.markdown(response)
+                        response = stream_response(agent, prompt, config, is_thinking_mode)
+                        finish_trace(tracer, answer_cache_hit=False)
+                        remember_answer(prompt, final_system_prompt, temperature, response)
+                        response = response or t["error_no_response"]
                         
                 except Exception as e:
                     response = f"❌ {st.session_state.language.upper()}: {str(e)}"
@@ -540,5 +833,5 @@ if prompt := st.chat_input(t["chat_placeholder"]):
                 response = t["agent_error"]
                 st.error(response)
     
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.rerun()
\ No newline at end of file
+    st.session_state.messages.append(make_message("assistant", response))
+    render_stats()
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Turkish vs English retrieval quality, per embedding model.
+
+Each question in questions.json is asked in English and in Turkish; a hit
+means a chunk of the PDF that answers it is among the top k results. Every
+model is indexed in its own directory (see vector_index.index_key), which is
+built on first use. Run from the repository root:
+
+    python benchmarks/crosslingual.py
+    python benchmarks/crosslingual.py --models english multilingual --mode dense -k 5
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings  # noqa: E402
+import vector_index  # noqa: E402
+
+QUESTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json")
+LANGUAGES = ("en", "tr")
+
+
+def load_questions(path=QUESTIONS_FILE):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["questions"]
+
+
+def first_hit_rank(docs, source):
+    """1-based rank of the first chunk from `source`, or None."""
+    for rank, doc in enumerate(docs, start=1):
+        if os.path.basename(doc.metadata.get("source", "")) == source:
+            return rank
+    return None
+
+
+def evaluate(retriever, questions, language):
+    ranks = [
+        first_hit_rank(retriever.invoke(question[language]), question["source"])
+        for question in questions
+    ]
+    found = [rank for rank in ranks if rank is not None]
+    return {
+        "hit_rate": len(found) / len(ranks),
+        "mrr": sum(1 / rank for rank in found) / len(ranks),
+        "misses": [q["id"] for q, rank in zip(questions, ranks) if rank is None],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=list(settings.EMBEDDING_PRESETS),
+                        help="Embedding presets or sentence-transformers model names.")
+    parser.add_argument("--mode", choices=["hybrid", "dense"], default=settings.RETRIEVAL_MODE)
+    parser.add_argument("-k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    questions = load_questions()
+    settings.RETRIEVAL_MODE = args.mode
+    results = {}
+    for model in args.models:
+        settings.EMBEDDING_MODEL = settings.EMBEDDING_PRESETS.get(model, model)
+        knowledge_base = vector_index.load_index()
+        if knowledge_base is None:
+            print(f"No PDFs found in {settings.PDF_DIR}")
+            return 1
+        retriever = vector_index.make_retriever(knowledge_base, k=args.k)
+        results[model] = {language: evaluate(retriever, questions, language) for language in LANGUAGES}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{len(questions)} questions, mode={args.mode}, k={args.k}")
+    print(f"{'model':<16} {'lang':<5} {'hit@k':>6} {'MRR':>6}  misses")
+    for model, by_language in results.items():
+        for language, result in by_language.items():
+            print(
+                f"{model:<16} {language:<5} {result['hit_rate']:>6.2f} {result['mrr']:>6.2f}  "
+                f"{', '.join(result['misses']) or '-'}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,407 @@
+"""End-to-end agent latency, token and load benchmark with a scripted model.
+
+Runs the agent graph the app builds (same retriever, tool, history trimming,
+checkpointer and streaming path) with `ScriptedChatModel` in place of Groq,
+so the numbers depend on this repository and not on the network:
+
+- cold_start: a fresh process importing the modules, loading the embedding
+  model, opening the index and answering the first retrieval
+- conversation: one session of --turns questions; per-turn latency split by
+  node, time to first answer token and tokens sent as the history grows
+- load: --sessions concurrent sessions of --load-turns questions each;
+  throughput, latency percentiles and resident memory
+
+The scripted model calls the retriever tool once per question, then answers;
+each call waits --latency-ms and streams at --tokens-per-second. Results go
+to a JSON file together with the git commit and settings; --compare prints
+the change against an earlier file. Run from the repository root:
+
+    python benchmarks/e2e.py
+    python benchmarks/e2e.py --sessions 1 8 32 --latency-ms 400 --output before.json
+    python benchmarks/e2e.py --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage  # noqa: E402
+from langchain_core.messages.utils import count_tokens_approximately  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+
+import settings  # noqa: E402
+import telemetry  # noqa: E402
+import vector_index  # noqa: E402
+from crosslingual import load_questions  # noqa: E402
+from vector_backends import percentile, rss_mb  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+TOOL_NAME = "fitness_knowledge"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Stands in for ChatGroq: one retriever tool call per question, then an answer.
+
+    Every call waits `latency_ms` before its first token and then produces
+    `tokens_per_second`. Usage metadata counts the prompt like history.py.
+    Calls without bound tools (history summaries) are answered directly.
+    """
+
+    latency_ms: float = 300.0
+    tokens_per_second: float = 200.0
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[tool.name for tool in tools], **kwargs)
+
+    def _reply(self, messages, tools):
+        if tools and isinstance(messages[-1], HumanMessage):
+            return AIMessage(content="", tool_calls=[{
+                "name": TOOL_NAME,
+                "args": {"query": messages[-1].content},
+                "id": f"call_{len(messages)}",
+            }])
+        return AIMessage(content=" ".join(f"word{i}" for i in range(self.answer_words)))
+
+    def _usage(self, messages, reply):
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = max(len(reply.content.split()), 1)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _pieces(self, reply):
+        words = reply.content.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)] if reply.content else []
+
+    def _chunks(self, messages, reply):
+        """(delay before the chunk, chunk) pairs of a streamed reply."""
+        usage = self._usage(messages, reply)
+        if reply.tool_calls:
+            call = reply.tool_calls[0]
+            yield self.latency_ms / 1000, AIMessageChunk(content="", usage_metadata=usage, tool_call_chunks=[{
+                "name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0,
+            }])
+            return
+        pieces = self._pieces(reply)
+        for i, piece in enumerate(pieces):
+            delay = self.latency_ms / 1000 if i == 0 else 1 / self.tokens_per_second
+            yield delay, AIMessageChunk(content=piece, usage_metadata=usage if i == len(pieces) - 1 else None)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages, kwargs.get("tools"))
+        time.sleep(self.latency_ms / 1000 + len(self._pieces(reply)) / self.tokens_per_second)
+        reply.usage_metadata = self._usage(messages, reply)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self.latency_ms / 1000 + len(self._pieces(reply)) / self.tokens_per_second)
+        reply.usage_metadata = self._usage(messages, reply)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for delay, chunk in self._chunks(messages, self._reply(messages, kwargs.get("tools"))):
+            time.sleep(delay)
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for delay, chunk in self._chunks(messages, self._reply(messages, kwargs.get("tools"))):
+            await asyncio.sleep(delay)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+def use_fake_embeddings():
+    """Deterministic hash embeddings, indexed in their own directory."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    settings.EMBEDDING_MODEL = "fake-384"
+    vector_index.get_embeddings = lambda: DeterministicFakeEmbedding(size=384)
+
+
+def build_graph(knowledge_base, checkpointer=None):
+    """The agent graph as app._create_agent builds it."""
+    from agent_graph import build_agent
+    from checkpointers import make_checkpointer
+    from custom_tools import RetrievalCache, create_retriever_tool
+    from translations import TRANSLATIONS
+
+    retriever = vector_index.make_retriever(knowledge_base)
+    cache = RetrievalCache(maxsize=settings.RETRIEVAL_CACHE_SIZE, ttl=settings.RETRIEVAL_CACHE_TTL)
+    executor = ThreadPoolExecutor(max_workers=settings.RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+    tools = {
+        language: [create_retriever_tool(
+            retriever,
+            name=TOOL_NAME,
+            description=strings["retriever_desc"],
+            cache=cache,
+            cache_version=knowledge_base.version,
+            context_tokens=settings.RETRIEVAL_CONTEXT_TOKENS,
+            executor=executor,
+        )]
+        for language, strings in TRANSLATIONS.items()
+    }
+    return build_agent(tools, checkpointer or make_checkpointer())
+
+
+class Runner:
+    """Runs turns against one compiled graph, like the app's sessions do."""
+
+    def __init__(self, agent, model, language="en"):
+        from streaming import EventLoopThread
+        from translations import TRANSLATIONS
+
+        self.agent = agent
+        self.model = model
+        self.language = language
+        self.system_prompt = TRANSLATIONS[language]["system_prompt"]
+        self.loop = EventLoopThread() if settings.AGENT_ASYNC else None
+
+    def turn(self, thread_id, question):
+        from agent_graph import turn_config
+        from streaming import astream_turn, stream_turn
+
+        config = turn_config(thread_id, self.model, self.system_prompt, language=self.language)
+        tracer = telemetry.TurnTracer(thread_id)
+        config["callbacks"] = [tracer]
+        inputs = {"messages": [HumanMessage(content=question)]}
+        began = time.perf_counter()
+        if self.loop is not None:
+            events = self.loop.iterate(astream_turn(self.agent, inputs, config))
+        else:
+            events = stream_turn(self.agent, inputs, config)
+        first_token = None
+        for event, _ in events:
+            if event == "answer" and first_token is None:
+                first_token = time.perf_counter() - began
+        record = tracer.finish()
+        record["ttft_ms"] = first_token * 1000 if first_token is not None else None
+        record["history"] = self.agent.get_state(config).values.get("history_report", {})
+        return record
+
+
+def node_split(record):
+    spans = record["spans"]
+    split = {name: spans[name]["ms"] for name in ("node.agent", "node.tools", "llm", "retriever") if name in spans}
+    # Everything that is not waiting on the model: graph, retrieval, history, checkpointer.
+    split["overhead"] = record["ms"] - split.get("llm", 0.0)
+    return split
+
+
+def run_conversation(runner, questions, turns):
+    results = []
+    for i in range(turns):
+        record = runner.turn("bench-conversation", questions[i % len(questions)])
+        results.append({
+            "turn": i + 1,
+            "ms": record["ms"],
+            "ttft_ms": record["ttft_ms"],
+            "nodes_ms": node_split(record),
+            "model_calls": record["model_calls"],
+            "tool_calls": record["tool_calls"],
+            "input_tokens": record["input_tokens"],
+            "output_tokens": record["output_tokens"],
+            "history_tokens": record["history"].get("history_tokens"),
+            "sent_tokens": record["history"].get("sent_tokens"),
+            "retrieval_cache_hits": record["retrieval_cache_hits"],
+        })
+    return results
+
+
+def run_load(runner, questions, sessions, turns_per_session):
+    """`sessions` threads, each a conversation of `turns_per_session` questions."""
+    records, errors = [], []
+    lock = threading.Lock()
+
+    def session(index):
+        for turn in range(turns_per_session):
+            try:
+                record = runner.turn(f"bench-load-{sessions}-{index}", questions[(index + turn) % len(questions)])
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            with lock:
+                records.append(record)
+
+    before = rss_mb()
+    began = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    latencies = [record["ms"] for record in records]
+    overheads = [node_split(record)["overhead"] for record in records]
+    return {
+        "sessions": sessions,
+        "turns": len(records),
+        "errors": errors,
+        "seconds": elapsed,
+        "turns_per_second": len(records) / elapsed,
+        "p50_ms": percentile(latencies, 50) if latencies else None,
+        "p95_ms": percentile(latencies, 95) if latencies else None,
+        "overhead_p50_ms": percentile(overheads, 50) if overheads else None,
+        "rss_mb": rss_mb(),
+        "rss_added_mb": rss_mb() - before,
+    }
+
+
+def measure_cold_start():
+    """Runs in the child process."""
+    began = time.perf_counter()
+    import agent_graph  # noqa: F401
+    import custom_tools  # noqa: F401
+    imported = time.perf_counter()
+    embeddings = vector_index.get_embeddings()
+    embedded = time.perf_counter()
+    knowledge_base = vector_index.load_index(embeddings=embeddings, sync=False)
+    opened = time.perf_counter()
+    vector_index.make_retriever(knowledge_base).invoke(load_questions()[0]["en"])
+    searched = time.perf_counter()
+    return {
+        "import_ms": (imported - began) * 1000,
+        "embeddings_ms": (embedded - imported) * 1000,
+        "open_index_ms": (opened - embedded) * 1000,
+        "first_retrieval_ms": (searched - opened) * 1000,
+        "total_ms": (searched - began) * 1000,
+        "rss_mb": rss_mb(),
+    }
+
+
+def run_cold_start(fake_embeddings):
+    command = [sys.executable, os.path.abspath(__file__), "--child"]
+    if fake_embeddings:
+        command.append("--fake-embeddings")
+    output = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "-uno"))}
+
+
+def summary(results):
+    """The headline numbers compared by --compare."""
+    headline = {"cold_start_ms": results["cold_start"]["total_ms"]}
+    conversation = results["conversation"]
+    if conversation:
+        headline["turn_ms_mean"] = sum(t["ms"] for t in conversation) / len(conversation)
+        headline["overhead_ms_mean"] = sum(t["nodes_ms"]["overhead"] for t in conversation) / len(conversation)
+        headline["sent_tokens_last"] = conversation[-1]["sent_tokens"]
+    for load in results["load"]:
+        headline[f"turns_per_second@{load['sessions']}"] = load["turns_per_second"]
+        headline[f"p95_ms@{load['sessions']}"] = load["p95_ms"]
+        headline[f"rss_mb@{load['sessions']}"] = load["rss_mb"]
+    return headline
+
+
+def print_comparison(old, new):
+    print(f"{'metric':<24} {old.get('commit') or '?':>12} {new.get('commit') or '?':>12} {'change':>8}")
+    old_summary, new_summary = summary(old), summary(new)
+    for name, value in new_summary.items():
+        before = old_summary.get(name)
+        change = f"{(value - before) / before * 100:+.1f}%" if before and value is not None else ""
+        before_text = f"{before:.1f}" if before is not None else "-"
+        value_text = f"{value:.1f}" if value is not None else "-"
+        print(f"{name:<24} {before_text:>12} {value_text:>12} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=8, help="Questions in the single-session conversation.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="Concurrent sessions to simulate.")
+    parser.add_argument("--load-turns", type=int, default=3, help="Questions per session under load.")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Model latency to the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Model output speed.")
+    parser.add_argument("--language", choices=["en", "tr"], default="en")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use hash embeddings instead of the sentence-transformers model.")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/e2e-<commit>.json).")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        use_fake_embeddings()
+    if args.child:
+        print(json.dumps(measure_cold_start()))
+        return 0
+
+    # Build or sync the index first, so cold start only opens it.
+    if vector_index.load_index() is None:
+        print(f"No PDFs found in {settings.PDF_DIR}")
+        return 1
+    cold_start = run_cold_start(args.fake_embeddings)
+
+    knowledge_base = vector_index.load_index(sync=False)
+    model = ScriptedChatModel(latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second)
+    questions = [question[args.language] for question in load_questions()]
+    runner = Runner(build_graph(knowledge_base), model, args.language)
+
+    results = {
+        **git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "settings": {
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "vector_backend": settings.VECTOR_BACKEND,
+            "retrieval_mode": settings.RETRIEVAL_MODE,
+            "rerank": settings.RERANK_ENABLED,
+            "agent_async": settings.AGENT_ASYNC,
+            "checkpointer": settings.CHECKPOINTER,
+            "history_token_budget": settings.HISTORY_TOKEN_BUDGET,
+        },
+        "model": {"latency_ms": args.latency_ms, "tokens_per_second": args.tokens_per_second},
+        "cold_start": cold_start,
+        "conversation": run_conversation(runner, questions, args.turns),
+        "load": [run_load(runner, questions, sessions, args.load_turns) for sessions in args.sessions],
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"cold start: {cold_start['total_ms']:.0f} ms "
+          f"(imports {cold_start['import_ms']:.0f}, embeddings {cold_start['embeddings_ms']:.0f}, "
+          f"open {cold_start['open_index_ms']:.0f}, first retrieval {cold_start['first_retrieval_ms']:.0f})")
+    print(f"{'turn':>4} {'ms':>8} {'ttft':>8} {'overhead':>9} {'tools':>8} {'sent tok':>9}")
+    for turn in results["conversation"]:
+        print(f"{turn['turn']:>4} {turn['ms']:>8.0f} {turn['ttft_ms'] or 0:>8.0f} "
+              f"{turn['nodes_ms']['overhead']:>9.1f} {turn['nodes_ms'].get('node.tools', 0):>8.1f} "
+              f"{turn['sent_tokens'] or 0:>9}")
+    print(f"{'sessions':>8} {'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8} {'errors':>7}")
+    for load in results["load"]:
+        print(f"{load['sessions']:>8} {load['turns_per_second']:>8.2f} {load['p50_ms'] or 0:>8.0f} "
+              f"{load['p95_ms'] or 0:>8.0f} {load['rss_mb']:>8.0f} {len(load['errors']):>7}")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+"""Import cost of the app's dependencies and of the app's first screens.
+
+Two reports, each measured in fresh processes:
+
+- modules: cumulative import time of each module (``python -X importtime``),
+  and with --detail MODULE the packages that dominate it
+- screens: one script run of app.py (through Streamlit's AppTest) for the
+  language selection, API-key and chat screens, with the heavy modules that
+  were loaded by then. The first two should load none of them. The index
+  warm-up is switched off (FITAI_WARMUP=0) for these runs: it imports the
+  index stack in a background thread, which would make the result depend on
+  thread timing rather than on what the screens import.
+
+Run from the repository root:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --detail langchain_groq --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "streamlit",
+    "numpy",
+    "langchain_core.messages",
+    "langgraph.graph",
+    "langchain_groq",
+    "vector_index",
+    "agent_graph",
+    "custom_tools",
+    "langchain_community.vectorstores",
+    "langchain_community.embeddings",
+    "sentence_transformers",
+    "torch",
+]
+
+# Modules that must not be loaded before the chat screen.
+HEAVY = ["numpy", "langchain_core", "langgraph", "langchain_groq", "langchain_community", "chromadb", "torch", "sentence_transformers"]
+
+SCREEN_SCRIPT = """
+import json, os, sys, time
+from streamlit.testing.v1 import AppTest
+
+screen, heavy = sys.argv[1], sys.argv[2].split(",")
+os.environ.pop("GROQ_API_KEY", None)
+os.environ["FITAI_WARMUP"] = "0"
+if screen == "chat":
+    os.environ["GROQ_API_KEY"] = "gsk_import_time"
+app = AppTest.from_file(os.path.join(os.getcwd(), "app.py"), default_timeout=120)
+if screen != "language":
+    app.session_state["language"] = "en"
+began = time.perf_counter()
+app.run()
+print(json.dumps({
+    "ms": (time.perf_counter() - began) * 1000,
+    "errors": [str(e.value) for e in app.exception],
+    "heavy_modules": [m for m in heavy if m in sys.modules],
+}))
+"""
+
+
+def import_times(module):
+    """{module: (self_us, cumulative_us)} of everything `import module` loads."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode:
+        return None
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def module_report(modules):
+    report = {}
+    for module in modules:
+        times = import_times(module)
+        report[module] = times[module][1] / 1000 if times and module in times else None
+    return report
+
+
+def detail_report(module, top):
+    """Top-level packages of `module`'s import tree by self time."""
+    times = import_times(module) or {}
+    packages = {}
+    for name, (self_us, _) in times.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us / 1000
+    return dict(sorted(packages.items(), key=lambda item: -item[1])[:top])
+
+
+def screen_report():
+    report = {}
+    for screen in ("language", "api_key", "chat"):
+        result = subprocess.run(
+            [sys.executable, "-c", SCREEN_SCRIPT, screen, ",".join(HEAVY)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode:
+            report[screen] = {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+        else:
+            report[screen] = json.loads(result.stdout.strip().splitlines()[-1])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--detail", help="Break down the import time of this module by package.")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--no-screens", action="store_true", help="Skip the app screen runs.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    results = {"modules": module_report(args.modules)}
+    if args.detail:
+        results["detail"] = {args.detail: detail_report(args.detail, args.top)}
+    if not args.no_screens:
+        results["screens"] = screen_report()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'module':<36} {'import ms':>10}")
+    for module, ms in results["modules"].items():
+        print(f"{module:<36} {ms:>10.0f}" if ms is not None else f"{module:<36} {'not installed':>10}")
+    for module, packages in results.get("detail", {}).items():
+        print(f"\n{module}, self time by package:")
+        for package, ms in packages.items():
+            print(f"  {package:<34} {ms:>10.0f}")
+    if "screens" in results:
+        print(f"\n{'app screen':<12} {'run ms':>8}  heavy modules loaded")
+        for screen, result in results["screens"].items():
+            if "error" in result:
+                print(f"{screen:<12} {'-':>8}  error: {result['error']}")
+                continue
+            loaded = ", ".join(result["heavy_modules"]) or "none"
+            errors = f"  errors: {result['errors']}" if result["errors"] else ""
+            print(f"{screen:<12} {result['ms']:>8.0f}  {loaded}{errors}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+"""Query-embedding throughput with and without micro-batching.
+
+`threads` workers each embed single queries back to back, as concurrent
+searches do. Reports queries per second for the plain model and for
+MicroBatchingEmbeddings, and the batch-size histogram of the latter.
+
+Run from the repository root:
+
+    python benchmarks/query_batching.py
+    python benchmarks/query_batching.py --threads 1 4 16 --max-wait-ms 1 2 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import settings  # noqa: E402
+from embedding_batcher import MicroBatchingEmbeddings  # noqa: E402
+
+
+def load_queries():
+    from crosslingual import load_questions
+
+    return [q[lang] for q in load_questions() for lang in ("en", "tr")]
+
+
+def throughput(embeddings, queries, threads, seconds):
+    """Queries per second embedded by `threads` concurrent callers."""
+    deadline = time.perf_counter() + seconds
+
+    def worker(offset):
+        done = 0
+        while time.perf_counter() < deadline:
+            embeddings.embed_query(queries[(offset + done) % len(queries)])
+            done += 1
+        return done
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        done = sum(pool.map(worker, range(threads)))
+    return done / (time.perf_counter() - began)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[settings.EMBED_QUERY_MAX_WAIT_MS])
+    parser.add_argument("--max-batch", type=int, default=settings.EMBED_QUERY_MAX_BATCH)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each measurement.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    settings.EMBED_QUERY_BATCHING = False
+    import vector_index
+
+    model = vector_index.get_embeddings()
+    queries = load_queries()
+    model.embed_documents(queries)  # warm-up
+
+    results = []
+    for threads in args.threads:
+        result = {"threads": threads, "plain_qps": throughput(model, queries, threads, args.seconds)}
+        for max_wait_ms in args.max_wait_ms:
+            batching = MicroBatchingEmbeddings(model, max_batch=args.max_batch, max_wait=max_wait_ms / 1000)
+            result[f"batched_qps@{max_wait_ms:g}ms"] = throughput(batching, queries, threads, args.seconds)
+            result[f"batches@{max_wait_ms:g}ms"] = batching.stats()
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    for result in results:
+        print(f"{result['threads']} threads: plain {result['plain_qps']:.1f} q/s")
+        for max_wait_ms in args.max_wait_ms:
+            stats = result[f"batches@{max_wait_ms:g}ms"]
+            print(
+                f"  batched, wait {max_wait_ms:g} ms: {result[f'batched_qps@{max_wait_ms:g}ms']:.1f} q/s, "
+                f"mean batch {stats['mean_batch_size']:.1f}, histogram {stats['histogram']}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,231 @@
+"""Retrieval quality, latency and index cost per retriever configuration.
+
+Every question of the golden set (questions.json, in English and Turkish)
+names the PDF and the pages that answer it. For each combination of
+embedding model, chunk size, chunk overlap and vector backend, an index is
+built in a fresh process and every retrieval mode is evaluated on it:
+
+- recall@k: share of questions with a chunk from an expected page in the
+  top k, for each requested k
+- MRR: mean reciprocal rank of the first such chunk (0 if none in the top k)
+- p50_ms / p95_ms: one retrieval, query embedding included
+- index_mb, chunks and build_s: size and build time of the index
+
+No LLM is called. Indexes go to --index-dir (not the app's index) and are
+rebuilt every run unless --reuse is given, in which case build_s is only
+reported for indexes that had to be built. Run from the repository root:
+
+    python benchmarks/retrieval_eval.py
+    python benchmarks/retrieval_eval.py --chunk-sizes 500 1000 --chunk-overlaps 100 200 -k 3 5 --modes hybrid dense
+    python benchmarks/retrieval_eval.py --models english multilingual --target-recall 0.8 --output eval.json
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import settings  # noqa: E402
+from crosslingual import LANGUAGES, load_questions  # noqa: E402
+from vector_backends import percentile  # noqa: E402
+
+DEFAULT_INDEX_DIR = os.path.join(ROOT, "benchmarks", "results", "indexes")
+
+
+def first_page_hit(docs, question):
+    """1-based rank of the first chunk from an expected page, or None."""
+    for rank, doc in enumerate(docs, start=1):
+        metadata = doc.metadata
+        if os.path.basename(metadata.get("source", "")) == question["source"] and metadata.get("page") in question["pages"]:
+            return rank
+    return None
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(folder, name))
+        for folder, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def score(ranks, ks):
+    found = [rank for rank in ranks if rank is not None]
+    return {
+        **{f"recall@{k}": sum(rank <= k for rank in found) / len(ranks) for k in ks},
+        "mrr": sum(1 / rank for rank in found) / len(ranks),
+    }
+
+
+def evaluate(retriever, questions, ks, repeat):
+    """Scores per language and overall, plus per-query latency percentiles."""
+    ranks = {language: [] for language in LANGUAGES}
+    latencies = []
+    retriever.invoke(questions[0]["en"])  # warm-up: lazy structures, first embedding
+    for question in questions:
+        for language in LANGUAGES:
+            for _ in range(repeat):
+                began = time.perf_counter()
+                docs = retriever.invoke(question[language])
+                latencies.append((time.perf_counter() - began) * 1000)
+            ranks[language].append(first_page_hit(docs, question))
+    result = score([rank for language in LANGUAGES for rank in ranks[language]], ks)
+    result["by_language"] = {language: score(ranks[language], ks) for language in LANGUAGES}
+    result["misses"] = sorted({
+        question["id"]
+        for language in LANGUAGES
+        for question, rank in zip(questions, ranks[language])
+        if rank is None
+    })
+    result["p50_ms"] = percentile(latencies, 50)
+    result["p95_ms"] = percentile(latencies, 95)
+    return result
+
+
+def measure(modes, ks, repeat, reuse):
+    """Runs in the child process, configured through the environment."""
+    import vector_index
+
+    embeddings = vector_index.get_embeddings()
+    began = time.perf_counter()
+    knowledge_base = vector_index.load_index(embeddings=embeddings, rebuild=not reuse)
+    build_s = time.perf_counter() - began
+    if knowledge_base is None:
+        raise SystemExit(f"No PDFs found in {settings.PDF_DIR}")
+    built = knowledge_base.report["chunks_added"] > 0 or knowledge_base.report["chunks_deleted"] > 0
+
+    questions = load_questions()
+    results = {}
+    for mode in modes:
+        settings.RETRIEVAL_MODE = mode
+        retriever = vector_index.make_retriever(knowledge_base, k=max(ks))
+        results[mode] = evaluate(retriever, questions, ks, repeat)
+    return {
+        "build_s": build_s if built else None,
+        "index_mb": directory_size(vector_index.index_path()) / 2**20,
+        "chunks": vector_index.manifest_chunk_count(knowledge_base.manifest),
+        "modes": results,
+    }
+
+
+def run_child(config, args):
+    env = {
+        **os.environ,
+        "FITAI_EMBEDDING_MODEL": settings.EMBEDDING_PRESETS.get(config["model"], config["model"]),
+        "FITAI_CHUNK_SIZE": str(config["chunk_size"]),
+        "FITAI_CHUNK_OVERLAP": str(config["chunk_overlap"]),
+        "FITAI_VECTOR_BACKEND": config["backend"],
+        "FITAI_INDEX_DIR": args.index_dir,
+        "FITAI_RERANK": "0",
+    }
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child",
+        "--modes", *args.modes, "-k", *map(str, args.k), "--repeat", str(args.repeat),
+    ]
+    if args.reuse:
+        command.append("--reuse")
+    if args.fake_embeddings:
+        command.append("--fake-embeddings")
+    output = subprocess.run(command, env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=[settings.EMBEDDING_PRESET],
+                        help="Embedding presets or sentence-transformers model names.")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[settings.CHUNK_SIZE])
+    parser.add_argument("--chunk-overlaps", type=int, nargs="+", default=[settings.CHUNK_OVERLAP])
+    parser.add_argument("--backends", nargs="+", choices=["chroma", "numpy"], default=[settings.VECTOR_BACKEND])
+    parser.add_argument("--modes", nargs="+", choices=["hybrid", "dense"], default=["hybrid", "dense"])
+    parser.add_argument("-k", type=int, nargs="+", default=sorted({1, settings.RETRIEVAL_K, 5}))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed retrievals per question and language.")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--reuse", action="store_true", help="Keep existing indexes instead of rebuilding them.")
+    parser.add_argument("--target-recall", type=float,
+                        help="Also print the fastest configuration with at least this recall@k.")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Hash embeddings instead of the model: checks the harness, not quality.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.k = sorted(set(args.k))
+
+    if args.fake_embeddings:
+        from e2e import use_fake_embeddings
+
+        use_fake_embeddings()
+    if args.child:
+        print(json.dumps(measure(args.modes, args.k, args.repeat, args.reuse)))
+        return 0
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json"), encoding="utf-8") as f:
+        question_set = json.load(f)
+    rows = []
+    for model, chunk_size, chunk_overlap, backend in itertools.product(
+        args.models, args.chunk_sizes, args.chunk_overlaps, args.backends
+    ):
+        if chunk_overlap >= chunk_size:
+            continue
+        config = {"model": model, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "backend": backend}
+        measured = run_child(config, args)
+        for mode, result in measured["modes"].items():
+            rows.append({
+                **config,
+                "mode": mode,
+                "build_s": measured["build_s"],
+                "index_mb": measured["index_mb"],
+                "chunks": measured["chunks"],
+                **result,
+            })
+
+    results = {
+        "questions_version": question_set["version"],
+        "questions": len(question_set["questions"]),
+        "k": args.k,
+        "configurations": rows,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"questions v{results['questions_version']}: {results['questions']} x {len(LANGUAGES)} languages")
+    recall_columns = " ".join(f"{'R@' + str(k):>6}" for k in args.k)
+    print(
+        f"{'model':<14} {'size':>5} {'ovl':>4} {'backend':<7} {'mode':<6} {recall_columns} {'MRR':>5} "
+        f"{'p50 ms':>7} {'p95 ms':>7} {'MB':>6} {'chunks':>6} {'build s':>7}"
+    )
+    for row in rows:
+        recalls = " ".join(f"{row[f'recall@{k}']:>6.2f}" for k in args.k)
+        build = f"{row['build_s']:>7.1f}" if row["build_s"] is not None else f"{'-':>7}"
+        print(
+            f"{row['model']:<14} {row['chunk_size']:>5} {row['chunk_overlap']:>4} {row['backend']:<7} "
+            f"{row['mode']:<6} {recalls} {row['mrr']:>5.2f} {row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f} "
+            f"{row['index_mb']:>6.1f} {row['chunks']:>6} {build}"
+        )
+
+    if args.target_recall is not None:
+        k = settings.RETRIEVAL_K if settings.RETRIEVAL_K in args.k else args.k[-1]
+        passing = [row for row in rows if row[f"recall@{k}"] >= args.target_recall]
+        if passing:
+            best = min(passing, key=lambda row: row["p50_ms"])
+            print(
+                f"Fastest with recall@{k} >= {args.target_recall}: {best['model']}, chunk {best['chunk_size']}/"
+                f"{best['chunk_overlap']}, {best['backend']}, {best['mode']} ({best['p50_ms']:.2f} ms p50)"
+            )
+        else:
+            print(f"No configuration reaches recall@{k} >= {args.target_recall}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
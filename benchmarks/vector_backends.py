@@ -0,0 +1,132 @@
+"""Chroma vs the NumPy vector store: load time, query latency and memory.
+
+The index of every backend is built (or synced) first. Each backend is then
+measured in a fresh process so import and open costs are cold:
+
+- load_ms: importing the backend, opening the persisted index and the first
+  search (which loads lazily built structures such as the IVF clusters)
+- p50_ms / p95_ms: one vector search, query embedding excluded
+- rss_mb: resident memory added by opening the index and searching
+
+Run from the repository root:
+
+    python benchmarks/vector_backends.py
+    python benchmarks/vector_backends.py --backends chroma numpy numpy-ivf --repeat 50
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import settings  # noqa: E402
+
+# Name -> environment of the measured process.
+BACKENDS = {
+    "chroma": {"FITAI_VECTOR_BACKEND": "chroma"},
+    "numpy": {"FITAI_VECTOR_BACKEND": "numpy", "FITAI_NUMPY_INDEX": "flat"},
+    "numpy-int8": {"FITAI_VECTOR_BACKEND": "numpy", "FITAI_NUMPY_INDEX": "flat", "FITAI_NUMPY_INT8": "1"},
+    "numpy-ivf": {"FITAI_VECTOR_BACKEND": "numpy", "FITAI_NUMPY_INDEX": "ivf"},
+}
+
+
+def rss_mb():
+    """Current resident set size (Linux), else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def measure(repeat, k):
+    """Runs in the child process, configured through the environment."""
+    import vector_index
+    from crosslingual import load_questions
+
+    embeddings = vector_index.get_embeddings()
+    queries = [q[lang] for q in load_questions() for lang in ("en", "tr")]
+    vectors = embeddings.embed_documents(queries)
+    before = rss_mb()
+
+    began = time.perf_counter()
+    vectorstore = vector_index.open_vectorstore(vector_index.index_path(), embeddings)
+    vectorstore.similarity_search_by_vector(vectors[0], k=k)
+    load_ms = (time.perf_counter() - began) * 1000
+
+    latencies = []
+    for _ in range(repeat):
+        for vector in vectors:
+            began = time.perf_counter()
+            vectorstore.similarity_search_by_vector(vector, k=k)
+            latencies.append((time.perf_counter() - began) * 1000)
+
+    return {
+        "load_ms": load_ms,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "rss_mb": rss_mb() - before,
+        "queries": len(latencies),
+    }
+
+
+def build(backend):
+    env = {**os.environ, **BACKENDS[backend]}
+    subprocess.run([sys.executable, os.path.join(ROOT, "build_index.py")], env=env, cwd=ROOT, check=True)
+
+
+def run_child(backend, repeat, k):
+    env = {**os.environ, **BACKENDS[backend]}
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--repeat", str(repeat), "-k", str(k)],
+        env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the benchmark questions.")
+    parser.add_argument("-k", type=int, default=settings.RERANK_FETCH_K)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.repeat, args.k)))
+        return 0
+
+    results = {}
+    for backend in args.backends:
+        build(backend)
+        results[backend] = run_child(backend, args.repeat, args.k)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"k={args.k}, {next(iter(results.values()))['queries']} queries per backend")
+    print(f"{'backend':<12} {'load ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8}")
+    for backend, result in results.items():
+        print(
+            f"{backend:<12} {result['load_ms']:>9.1f} {result['p50_ms']:>8.3f} "
+            f"{result['p95_ms']:>8.3f} {result['rss_mb']:>8.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
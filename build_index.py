@@ -0,0 +1,51 @@
+"""Build or refresh the persisted vector index ahead of time.
+
+Run this once per deploy (or whenever the PDFs change) so serving processes
+only ever open the index from disk. Only added, changed or removed PDFs are
+re-embedded:
+
+    python build_index.py
+"""
+import argparse
+import time
+
+import settings
+import vector_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Fitness AI Coach vector index.")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the existing index and embed every PDF again.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    knowledge_base = vector_index.load_index(rebuild=args.rebuild)
+    if knowledge_base is None:
+        print(f"No PDFs found in {settings.PDF_DIR}")
+        return 1
+
+    elapsed = time.perf_counter() - start
+    manifest, report = knowledge_base.manifest, knowledge_base.report
+    for key in ("added", "changed", "removed"):
+        for name in report[key]:
+            print(f"  {key}: {name}")
+    for name, timing in sorted(report["timings"].items(), key=lambda item: -item[1]["wall_seconds"]):
+        print(
+            f"  parsed {name}: {timing['pages']} pages in {timing['wall_seconds']:.2f}s "
+            f"({timing['cpu_seconds']:.2f}s worker CPU)"
+        )
+    if report["timings"]:
+        dedup = report["dedup"]
+        print(
+            f"  dedup: {dedup['furniture_lines']} header/footer lines stripped, "
+            f"{dedup['exact_duplicates']} duplicate and {dedup['near_duplicates']} near-duplicate chunks dropped"
+        )
+    print(
+        f"Index ready: {len(manifest['files'])} PDFs, {vector_index.manifest_chunk_count(manifest)} chunks "
+        f"(+{report['chunks_added']} / -{report['chunks_deleted']} chunks, {elapsed:.1f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
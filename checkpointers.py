@@ -0,0 +1,251 @@
+"""Checkpointer backends for the agent's conversation memory.
+
+- "memory": BoundedMemorySaver, an in-process saver that evicts idle and
+  least recently used threads and caps the bytes kept per thread.
+- "sqlite": LangGraph's SqliteSaver (needs `langgraph-checkpoint-sqlite`),
+  which keeps conversations across restarts. Its async methods run the
+  sync ones in a thread.
+
+`checkpointer_stats()` reports live threads and retained bytes for either.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from langgraph.checkpoint.memory import MemorySaver
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemorySaver(MemorySaver):
+    """MemorySaver with eviction.
+
+    Args:
+        max_threads: Keep at most this many threads; the least recently used
+            ones are evicted first. 0 disables the limit.
+        idle_ttl: Evict threads not written to for this many seconds. 0
+            disables expiry.
+        max_thread_bytes: When a thread retains more than this, its older
+            checkpoints are pruned and only the latest one is kept. 0 disables
+            the cap. It is a soft limit: the latest checkpoint holds the
+            conversation, so it is kept even when it alone is larger.
+    """
+
+    def __init__(self, max_threads=1000, idle_ttl=6 * 3600, max_thread_bytes=2 << 20, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.idle_ttl = idle_ttl
+        self.max_thread_bytes = max_thread_bytes
+        self.evicted_threads = 0
+        self._lock = threading.RLock()
+        # thread_id -> last write time, oldest first
+        self._last_used = OrderedDict()
+        # thread_id -> keys into self.blobs / self.writes owned by that thread
+        self._blob_keys = {}
+        self._write_keys = {}
+        self._bytes = {}
+
+    # --- Bookkeeping ---
+
+    def _thread_bytes(self, thread_id):
+        total = sum(len(self.blobs[key][1]) for key in self._blob_keys.get(thread_id, ()))
+        for writes_key in self._write_keys.get(thread_id, ()):
+            total += sum(len(value[2][1]) for value in self.writes.get(writes_key, {}).values())
+        for namespace in self.storage.get(thread_id, {}).values():
+            total += sum(len(c[1]) + len(m[1]) for c, m, _ in namespace.values())
+        return total
+
+    def _touch(self, thread_id):
+        self._last_used[thread_id] = time.monotonic()
+        self._last_used.move_to_end(thread_id)
+
+    def _evict(self, keep):
+        now = time.monotonic()
+        for thread_id, last_used in list(self._last_used.items()):
+            if thread_id == keep:
+                continue
+            too_many = self.max_threads and len(self._last_used) > self.max_threads
+            idle = self.idle_ttl and now - last_used > self.idle_ttl
+            if not (too_many or idle):
+                # Ordered by last use: nothing newer can be idle either.
+                break
+            self._drop_thread(thread_id)
+            self.evicted_threads += 1
+
+    def _drop_thread(self, thread_id):
+        self.storage.pop(thread_id, None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        for key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        self._bytes.pop(thread_id, None)
+        self._last_used.pop(thread_id, None)
+
+    def _prune(self, thread_id):
+        """Keep only the latest checkpoint of each namespace of `thread_id`."""
+        keep_blobs = set()
+        keep_writes = set()
+        for checkpoint_ns, checkpoints in self.storage.get(thread_id, {}).items():
+            if not checkpoints:
+                continue
+            latest_id = max(checkpoints)
+            latest = checkpoints[latest_id]
+            for checkpoint_id in [c for c in checkpoints if c != latest_id]:
+                del checkpoints[checkpoint_id]
+            # The latest checkpoint no longer has a stored parent.
+            checkpoints[latest_id] = (latest[0], latest[1], None)
+            channel_versions = self.serde.loads_typed(latest[0])["channel_versions"]
+            keep_blobs.update((thread_id, checkpoint_ns, k, v) for k, v in channel_versions.items())
+            keep_writes.add((thread_id, checkpoint_ns, latest_id))
+
+        for key in self._blob_keys.get(thread_id, set()) - keep_blobs:
+            self.blobs.pop(key, None)
+        for key in self._write_keys.get(thread_id, set()) - keep_writes:
+            self.writes.pop(key, None)
+        self._blob_keys[thread_id] = self._blob_keys.get(thread_id, set()) & keep_blobs
+        self._write_keys[thread_id] = self._write_keys.get(thread_id, set()) & keep_writes
+
+    def _after_write(self, thread_id):
+        self._touch(thread_id)
+        self._bytes[thread_id] = self._thread_bytes(thread_id)
+        if self.max_thread_bytes and self._bytes[thread_id] > self.max_thread_bytes:
+            self._prune(thread_id)
+            self._bytes[thread_id] = self._thread_bytes(thread_id)
+            if self._bytes[thread_id] > self.max_thread_bytes:
+                logger.warning(
+                    "thread %s keeps %d bytes in its latest checkpoint (soft cap %d)",
+                    thread_id, self._bytes[thread_id], self.max_thread_bytes
+                )
+        self._evict(keep=thread_id)
+
+    # --- BaseCheckpointSaver ---
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            self._blob_keys.setdefault(thread_id, set()).update(
+                (thread_id, checkpoint_ns, k, v) for k, v in new_versions.items()
+            )
+            self._after_write(thread_id)
+            return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            thread_id = config["configurable"]["thread_id"]
+            self._write_keys.setdefault(thread_id, set()).add((
+                thread_id,
+                config["configurable"].get("checkpoint_ns", ""),
+                config["configurable"]["checkpoint_id"],
+            ))
+            self._after_write(thread_id)
+
+    def _stored(self, config):
+        # MemorySaver indexes defaultdicts, so reading an evicted (or unknown)
+        # thread would create empty entries for it again.
+        namespaces = self.storage.get(config["configurable"]["thread_id"])
+        return bool(namespaces) and config["configurable"].get("checkpoint_ns", "") in namespaces
+
+    def get_tuple(self, config):
+        with self._lock:
+            if not self._stored(config):
+                return None
+            return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        with self._lock:
+            if config is not None and config["configurable"]["thread_id"] not in self.storage:
+                return iter(())
+            return iter(list(super().list(config, filter=filter, before=before, limit=limit)))
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self._drop_thread(thread_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "threads": len(self._last_used),
+                "bytes": sum(self._bytes.values()),
+                "evicted_threads": self.evicted_threads,
+            }
+
+
+def make_checkpointer(backend=None):
+    backend = backend or settings.CHECKPOINTER
+    if backend == "memory":
+        return BoundedMemorySaver(
+            max_threads=settings.CHECKPOINT_MAX_THREADS,
+            idle_ttl=settings.CHECKPOINT_IDLE_TTL,
+            max_thread_bytes=settings.CHECKPOINT_MAX_THREAD_BYTES,
+        )
+    if backend == "sqlite":
+        import sqlite3
+
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise ImportError(
+                "The sqlite checkpointer needs `pip install langgraph-checkpoint-sqlite`."
+            ) from e
+
+        class ThreadedSqliteSaver(SqliteSaver):
+            """SqliteSaver whose async methods run the sync ones in a thread.
+
+            SqliteSaver has no async support, which the agent's async path
+            (ainvoke/astream) needs.
+            """
+
+            async def aget_tuple(self, config):
+                return await asyncio.to_thread(self.get_tuple, config)
+
+            async def alist(self, config, *, filter=None, before=None, limit=None):
+                checkpoints = await asyncio.to_thread(
+                    lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+                )
+                for checkpoint in checkpoints:
+                    yield checkpoint
+
+            async def aput(self, config, checkpoint, metadata, new_versions):
+                return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+            async def aput_writes(self, config, writes, task_id, task_path=""):
+                await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+            async def adelete_thread(self, thread_id):
+                await asyncio.to_thread(self.delete_thread, thread_id)
+
+        os.makedirs(os.path.dirname(settings.CHECKPOINT_SQLITE_PATH) or ".", exist_ok=True)
+        # Streamlit serves sessions from several threads; SqliteSaver locks internally.
+        saver = ThreadedSqliteSaver(sqlite3.connect(settings.CHECKPOINT_SQLITE_PATH, check_same_thread=False))
+        saver.setup()
+        return saver
+    raise ValueError(f"Unknown checkpointer backend: {backend!r}")
+
+
+def checkpointer_stats(checkpointer):
+    """Live threads and retained bytes, for capacity planning."""
+    if hasattr(checkpointer, "stats"):
+        return checkpointer.stats()
+
+    if hasattr(checkpointer, "conn"):
+        with checkpointer.lock:
+            threads = checkpointer.conn.execute(
+                "SELECT COUNT(DISTINCT thread_id) FROM checkpoints"
+            ).fetchone()[0]
+        path = settings.CHECKPOINT_SQLITE_PATH
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+        }
+
+    return {"backend": type(checkpointer).__name__, "threads": None, "bytes": None}
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
 from functools import partial
-from typing import Literal, Optional, Union
+from typing import Hashable, Literal, Optional, Union
 
 from langchain_core.callbacks import Callbacks
 from langchain_core.documents import Document
@@ -22,6 +28,169 @@ class RetrieverInput(BaseModel):
     query: str = Field(description="query to look up in retriever")
 
 
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as cache key."""
+    return " ".join(query.casefold().split())
+
+
+class RetrievalCache:
+    """Thread-safe LRU cache of retriever results with a time-to-live.
+
+    Entries are keyed on the normalized query, the retriever's ``k`` and the
+    index version. When a different index version is seen, every entry is
+    dropped, so a rebuilt corpus never serves stale documents.
+
+    Args:
+        maxsize: Maximum number of cached queries.
+        ttl: Seconds an entry stays valid. ``0`` disables expiry.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[str] = None
+        self._entries: OrderedDict[Hashable, tuple[float, list[Document]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: str) -> Optional[list[Document]]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: str, docs: list[Document]) -> None:
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), docs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _citation(metadata: dict) -> str:
+    source = os.path.basename(metadata.get("source", "")) or "unknown"
+    page = metadata.get("page")
+    return source if page is None else f"{source}, p. {page + 1}"
+
+
+def _merge_group(docs: list[Document]) -> list[Document]:
+    """Merge chunks of one page that touch or overlap, trimming the overlap."""
+    merged: list[Document] = []
+    end = -1
+    for doc in sorted(docs, key=lambda d: d.metadata["start_index"]):
+        start = doc.metadata["start_index"]
+        if merged and start <= end + 1:
+            overlap = end - start
+            text = doc.page_content[overlap:] if overlap > 0 else doc.page_content
+            previous = merged[-1]
+            separator = "" if overlap > 0 else " "
+            merged[-1] = Document(
+                page_content=previous.page_content + (separator + text if text else ""),
+                metadata=previous.metadata,
+            )
+            end = max(end, start + len(doc.page_content))
+            continue
+        merged.append(Document(page_content=doc.page_content, metadata=dict(doc.metadata)))
+        end = start + len(doc.page_content)
+    return merged
+
+
+def pack_documents(docs: list[Document], max_tokens: Optional[int] = None) -> list[Document]:
+    """Pack retrieved chunks into a compact, cited context.
+
+    Chunks from the same source page that are adjacent or overlap (by their
+    ``start_index``) are merged into one passage without the repeated text.
+    Passages keep the rank of their best chunk and get a ``citation``
+    metadata entry ("file.pdf, p. 4"). With ``max_tokens``, passages are
+    added until the budget (about 4 characters per token) is used up; the
+    last one is cut short if at least a few sentences fit.
+
+    Args:
+        docs: Retrieved documents, best first.
+        max_tokens: Approximate token budget for the passages and their
+            citations. ``None`` or ``0`` disables the limit.
+
+    Returns:
+        The packed passages, best first.
+    """
+    groups: dict[tuple, list[Document]] = {}
+    passages: list = []
+    for doc in docs:
+        metadata = doc.metadata
+        if "start_index" not in metadata:
+            passages.append(doc)
+            continue
+        key = (metadata.get("source"), metadata.get("page"))
+        if key not in groups:
+            groups[key] = []
+            passages.append(key)
+        groups[key].append(doc)
+
+    packed: list[Document] = []
+    for passage in passages:
+        if isinstance(passage, Document):
+            merged = [Document(page_content=passage.page_content, metadata=dict(passage.metadata))]
+        else:
+            merged = _merge_group(groups[passage])
+        for doc in merged:
+            doc.metadata["citation"] = _citation(doc.metadata)
+            if any(doc.page_content == other.page_content for other in packed):
+                continue
+            packed.append(doc)
+
+    if not max_tokens:
+        return packed
+
+    budget = max_tokens * 4
+    fitted: list[Document] = []
+    for doc in packed:
+        cost = len(doc.page_content) + len(doc.metadata["citation"]) + 4
+        if cost <= budget:
+            fitted.append(doc)
+            budget -= cost
+            continue
+        room = budget - len(doc.metadata["citation"]) - 4
+        if room >= 200:
+            text = doc.page_content[:room - 1].rsplit(" ", 1)[0]
+            fitted.append(Document(page_content=text + "…", metadata=doc.metadata))
+        break
+    return fitted
+
+
+def _cache_key(query: str, retriever: BaseRetriever) -> tuple:
+    search_kwargs = getattr(retriever, "search_kwargs", None) or {}
+    return (normalize_query(query), search_kwargs.get("k"))
+
+
 def _get_relevant_documents(
     query: str,
     retriever: BaseRetriever,
@@ -29,8 +198,16 @@ def _get_relevant_documents(
     document_separator: str,
     callbacks: Callbacks = None,
     response_format: Literal["content", "content_and_artifact"] = "content",
+    cache: Optional[RetrievalCache] = None,
+    cache_version: str = "",
+    context_tokens: Optional[int] = None,
 ) -> Union[str, tuple[str, list[Document]]]:
-    docs = retriever.invoke(query, config={"callbacks": callbacks})
+    docs = cache.get(_cache_key(query, retriever), cache_version) if cache else None
+    if docs is None:
+        docs = retriever.invoke(query, config={"callbacks": callbacks})
+        if cache:
+            cache.put(_cache_key(query, retriever), cache_version, docs)
+    docs = pack_documents(docs, context_tokens)
     content = document_separator.join(
         format_document(doc, document_prompt) for doc in docs
     )
@@ -47,8 +224,24 @@ async def _aget_relevant_documents(
     document_separator: str,
     callbacks: Callbacks = None,
     response_format: Literal["content", "content_and_artifact"] = "content",
+    cache: Optional[RetrievalCache] = None,
+    cache_version: str = "",
+    context_tokens: Optional[int] = None,
+    executor: Optional[Executor] = None,
 ) -> Union[str, tuple[str, list[Document]]]:
-    docs = await retriever.ainvoke(query, config={"callbacks": callbacks})
+    docs = cache.get(_cache_key(query, retriever), cache_version) if cache else None
+    if docs is None:
+        if executor is None:
+            docs = await retriever.ainvoke(query, config={"callbacks": callbacks})
+        else:
+            # Embedding and search block; keep them off the event loop, in a
+            # pool whose size bounds the concurrent retrievals.
+            docs = await asyncio.get_running_loop().run_in_executor(
+                executor, partial(retriever.invoke, query, config={"callbacks": callbacks})
+            )
+        if cache:
+            cache.put(_cache_key(query, retriever), cache_version, docs)
+    docs = pack_documents(docs, context_tokens)
     content = document_separator.join(
         [await aformat_document(doc, document_prompt) for doc in docs]
     )
@@ -67,6 +260,10 @@ def create_retriever_tool(
     document_prompt: Optional[BasePromptTemplate] = None,
     document_separator: str = "\n\n",
     response_format: Literal["content", "content_and_artifact"] = "content",
+    cache: Optional[RetrievalCache] = None,
+    cache_version: str = "",
+    context_tokens: Optional[int] = None,
+    executor: Optional[Executor] = None,
 ) -> Tool:
     """Create a tool to do retrieval of documents.
 
@@ -76,18 +273,29 @@ def create_retriever_tool(
             so should be unique and somewhat descriptive.
         description: The description for the tool. This will be passed to the language
             model, so should be descriptive.
-        document_prompt: The prompt to use for the document. Defaults to None.
+        document_prompt: The prompt to use for each packed passage. Defaults to
+            the passage preceded by its ``[citation]``.
         document_separator: The separator to use between documents. Defaults to "\n\n".
         response_format: The tool response format. If "content" then the output of
             the tool is interpreted as the contents of a ToolMessage. If
             "content_and_artifact" then the output is expected to be a two-tuple
             corresponding to the (content, artifact) of a ToolMessage (artifact
             being a list of documents in this case). Defaults to "content".
+        cache: Optional cache of retrieval results. Repeated queries are served
+            from it without embedding the query again. Defaults to None.
+        cache_version: Version of the index behind `retriever`; cached results
+            of any other version are discarded. Defaults to "".
+        context_tokens: Approximate token budget of the tool output. Retrieved
+            chunks are merged and cited by `pack_documents` either way.
+            Defaults to None (no limit).
+        executor: Executor that runs the retriever when the tool is called
+            asynchronously. Its size bounds how many retrievals run at once.
+            Defaults to None (the event loop's default executor).
 
     Returns:
         Tool class to pass to an agent.
     """
-    document_prompt = document_prompt or PromptTemplate.from_template("{page_content}")
+    document_prompt = document_prompt or PromptTemplate.from_template("[{citation}]\n{page_content}")
 
     # Wrapper functions to avoid 'partial' which confuses get_type_hints in Python 3.13+
     def func(query: str, callbacks: Callbacks = None) -> Union[str, tuple[str, list[Document]]]:
@@ -98,6 +306,9 @@ def create_retriever_tool(
             document_separator=document_separator,
             callbacks=callbacks,
             response_format=response_format,
+            cache=cache,
+            cache_version=cache_version,
+            context_tokens=context_tokens,
         )
 
     async def afunc(query: str, callbacks: Callbacks = None) -> Union[str, tuple[str, list[Document]]]:
@@ -108,6 +319,10 @@ def create_retriever_tool(
             document_separator=document_separator,
             callbacks=callbacks,
             response_format=response_format,
+            cache=cache,
+            cache_version=cache_version,
+            context_tokens=context_tokens,
+            executor=executor,
         )
 
     return Tool(
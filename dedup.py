@@ -0,0 +1,133 @@
+"""Removes repeated text from a file's pages and chunks before indexing.
+
+Three passes, per PDF:
+
+1. Page furniture: lines that recur at the top or bottom of many pages
+   (running headers, footers, copyright notices, "page 3 of 27") are
+   stripped before splitting. Digits are ignored when comparing lines, so
+   page numbers do not hide a repeated footer.
+2. Exact duplicates: chunks whose normalized text hashes the same as an
+   earlier chunk are dropped.
+3. Near duplicates: chunks whose 64-bit SimHash (over word 3-shingles) is
+   within a few bits of an earlier chunk's are dropped too.
+
+Each step returns what it removed so the index build can report it.
+"""
+import hashlib
+import re
+from collections import Counter
+
+import numpy as np
+
+import settings
+
+DIGITS = re.compile(r"\d+")
+WORDS = re.compile(r"\w+", re.UNICODE)
+SIMHASH_BITS = 64
+
+
+def _line_key(line):
+    return DIGITS.sub("#", " ".join(line.casefold().split()))
+
+
+def _edge_lines(lines, edge):
+    return set(range(min(edge, len(lines)))) | set(range(max(len(lines) - edge, 0), len(lines)))
+
+
+def strip_page_furniture(pages, min_share=None, edge_lines=3):
+    """Remove header/footer lines repeated on at least `min_share` of `pages`.
+
+    Only the first and last `edge_lines` lines of a page are candidates, so
+    repeated lines in the body (e.g. table headings) are kept. Pages left
+    empty are dropped. Returns (pages, lines_removed).
+    """
+    min_share = settings.DEDUP_FURNITURE_SHARE if min_share is None else min_share
+    split_pages = [page.page_content.splitlines() for page in pages]
+    counts = Counter()
+    for lines in split_pages:
+        counts.update({_line_key(lines[i]) for i in _edge_lines(lines, edge_lines) if lines[i].strip()})
+    threshold = max(3, min_share * len(pages))
+    furniture = {key for key, count in counts.items() if count >= threshold}
+
+    stripped, removed = [], 0
+    for page, lines in zip(pages, split_pages):
+        edges = _edge_lines(lines, edge_lines)
+        kept = [line for i, line in enumerate(lines) if i not in edges or _line_key(line) not in furniture]
+        removed += len(lines) - len(kept)
+        text = "\n".join(kept)
+        if text.strip():
+            stripped.append(page.model_copy(update={"page_content": text}))
+    return stripped, removed
+
+
+def simhash(text):
+    """64-bit SimHash of the word 3-shingles of `text`."""
+    words = WORDS.findall(text.casefold())
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    weights = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int.from_bytes(np.packbits(weights > 0, bitorder="little").tobytes(), "little")
+
+
+class SimHashIndex:
+    """Finds fingerprints within `max_distance` bits of an added one.
+
+    Fingerprints are split into `max_distance + 1` bands; two fingerprints
+    that differ in at most `max_distance` bits agree on at least one band,
+    so only fingerprints sharing a band are compared.
+    """
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = SIMHASH_BITS // bands
+        self._bands = [
+            (i * width, (1 << (SIMHASH_BITS - i * width if i == bands - 1 else width)) - 1)
+            for i in range(bands)
+        ]
+        self._buckets = [{} for _ in self._bands]
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    def near(self, fingerprint):
+        for buckets, key in zip(self._buckets, self._keys(fingerprint)):
+            for other in buckets.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, fingerprint):
+        for buckets, key in zip(self._buckets, self._keys(fingerprint)):
+            buckets.setdefault(key, []).append(fingerprint)
+
+
+def dedupe_chunks(chunks, max_distance=None):
+    """Drop exact and near-duplicate chunks, keeping the first occurrence.
+
+    A negative `max_distance` disables the near-duplicate pass. Returns
+    (chunks, exact_duplicates, near_duplicates).
+    """
+    max_distance = settings.DEDUP_SIMHASH_DISTANCE if max_distance is None else max_distance
+    seen = set()
+    near = SimHashIndex(max_distance) if max_distance >= 0 else None
+    kept, exact, similar = [], 0, 0
+    for chunk in chunks:
+        normalized = " ".join(chunk.page_content.casefold().split())
+        digest = hashlib.sha256(normalized.encode()).digest()
+        if digest in seen:
+            exact += 1
+            continue
+        seen.add(digest)
+        if near is not None:
+            fingerprint = simhash(normalized)
+            if near.near(fingerprint):
+                similar += 1
+                continue
+            near.add(fingerprint)
+        kept.append(chunk)
+    return kept, exact, similar
@@ -0,0 +1,109 @@
+"""Coalesces concurrent single-query embeddings into batches.
+
+Every retrieval embeds one short query. When several sessions search at the
+same time, one forward pass over a batch of queries costs little more than
+a pass over one, so `MicroBatchingEmbeddings.embed_query` puts the query on
+a queue; a worker thread collects queries for at most `max_wait` seconds or
+until `max_batch` are waiting, embeds them together and hands each caller
+its vector. `embed_documents` is already batched and goes straight through.
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+import telemetry
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Wraps `embeddings` so that concurrent `embed_query` calls share batches.
+
+    Queries are embedded with the wrapped model's `embed_documents`, which is
+    the same computation as `embed_query` for sentence-transformers models.
+
+    Args:
+        embeddings: The embedding model to wrap.
+        max_batch: Largest number of queries embedded together.
+        max_wait: Seconds to wait for more queries after the first one
+            arrives, when the previous batch had several. 0 only batches
+            queries that are already waiting.
+    """
+
+    def __init__(self, embeddings, max_batch=32, max_wait=0.002):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batch_sizes = Counter()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._last_batch = 0
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's attributes (model_name, client, ...).
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        # A lone caller would only pay the wait: hold the batch open only
+        # while queries are actually arriving concurrently.
+        wait = self.max_wait if self._last_batch > 1 or not self._queue.empty() else 0
+        deadline = time.monotonic() + wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                with telemetry.span("embed.queries", batch=len(texts)):
+                    vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._last_batch = len(batch)
+            with self._lock:
+                self.batch_sizes[len(batch)] += 1
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def embed_query(self, text):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self):
+        """Batch-size histogram and totals of the query batches so far."""
+        with self._lock:
+            histogram = dict(sorted(self.batch_sizes.items()))
+        batches = sum(histogram.values())
+        queries = sum(size * count for size, count in histogram.items())
+        return {
+            "batches": batches,
+            "queries": queries,
+            "mean_batch_size": queries / batches if batches else 0.0,
+            "histogram": histogram,
+        }
@@ -0,0 +1,122 @@
+"""Keeps the history sent to the model within a token budget.
+
+Two steps, cheapest first:
+
+1. Tool outputs (retrieved PDF chunks) of earlier turns are cut down to a
+   short excerpt; the model has already answered from them.
+2. If the history is still over budget, the oldest whole turns are folded
+   into a running summary and removed from the conversation state.
+
+Token counts are approximate (characters / 4), which is plenty for a budget.
+"""
+import logging
+
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.constants import TAG_NOSTREAM
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below between a user and a fitness coach in a few sentences. "
+    "Keep the user's goals, constraints, personal details and any advice already given. "
+    "Write the summary in the same language as the conversation."
+)
+
+
+def current_turn_start(messages):
+    """Index of the last human message, i.e. where the current turn begins."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return index
+    return 0
+
+
+def compact_tool_outputs(messages, max_chars):
+    """Shorten tool outputs of earlier turns; the current turn is left intact."""
+    start = current_turn_start(messages)
+    compacted = []
+    for index, message in enumerate(messages):
+        if index < start and isinstance(message, ToolMessage) and len(message.content) > max_chars:
+            message = message.model_copy(
+                update={"content": message.content[:max_chars] + " … [truncated]"}
+            )
+        compacted.append(message)
+    return compacted
+
+
+def turn_starts(messages):
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+def split_for_budget(messages, budget, reserved=0):
+    """Return the index of the first message to keep so the rest fits `budget`.
+
+    Only cuts at the start of a turn, so tool calls stay next to their
+    results, and never drops the current turn.
+    """
+    for start in turn_starts(messages):
+        if count_tokens_approximately(messages[start:]) + reserved <= budget:
+            return start
+    return current_turn_start(messages)
+
+
+def summarize(llm, summary, messages):
+    transcript = "\n".join(
+        f"{message.type}: {message.content}"
+        for message in messages
+        if message.content and not isinstance(message, ToolMessage)
+    )
+    if summary:
+        transcript = f"Earlier summary: {summary}\n\n{transcript}"
+    # Tagged so token streaming of the agent node does not show the summary.
+    response = llm.bind(temperature=0).invoke(
+        [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=transcript)],
+        config={"tags": [TAG_NOSTREAM]},
+    )
+    return response.content
+
+
+def prepare_history(messages, summary, system_prompt, llm, budget, tool_output_chars):
+    """Build the model input for this turn.
+
+    Returns (model_messages, state_update, report). `state_update` removes
+    messages that were folded into the summary and stores the new summary;
+    `report` has the token counts before and after trimming.
+    """
+    def with_summary(prompt, text):
+        if not text:
+            return SystemMessage(content=prompt)
+        return SystemMessage(content=f"{prompt}\n\nSUMMARY OF THE EARLIER CONVERSATION:\n{text}")
+
+    original_tokens = count_tokens_approximately([with_summary(system_prompt, summary)] + messages)
+    state_update = {}
+
+    kept = compact_tool_outputs(messages, tool_output_chars)
+    system_message = with_summary(system_prompt, summary)
+    reserved = count_tokens_approximately([system_message])
+
+    if count_tokens_approximately(kept) + reserved > budget:
+        cut = split_for_budget(kept, budget, reserved)
+        if cut > 0:
+            summary = summarize(llm, summary, messages[:cut])
+            state_update = {
+                "messages": [RemoveMessage(id=message.id) for message in messages[:cut]],
+                "summary": summary,
+            }
+            kept = kept[cut:]
+            system_message = with_summary(system_prompt, summary)
+
+    model_messages = [system_message] + kept
+    sent_tokens = count_tokens_approximately(model_messages)
+    report = {
+        "history_tokens": original_tokens,
+        "sent_tokens": sent_tokens,
+        "saved_tokens": max(original_tokens - sent_tokens, 0),
+        "summarized_messages": len(state_update.get("messages", [])),
+    }
+    logger.info(
+        "history: %(sent_tokens)d tokens sent, %(saved_tokens)d saved, "
+        "%(summarized_messages)d messages summarized", report
+    )
+    return model_messages, state_update, report
@@ -0,0 +1,177 @@
+"""Keyword (BM25) search next to the dense vector search.
+
+MiniLM embeddings are good at paraphrases but weak at exact terms such as
+exercise or supplement names and numbers. `BM25Index` is a small in-process
+inverted index over the same chunks as the vector store, persisted next to
+it, and `HybridRetriever` fuses both result lists with reciprocal rank
+fusion (RRF).
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+BM25_FILE = "bm25.json"
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def chunk_key(doc):
+    """Identity of a chunk across retrievers."""
+    return doc.metadata.get("chunk_id") or doc.id or hash(doc.page_content)
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts.
+
+    Documents are stored by chunk ID; the postings are rebuilt lazily after
+    documents are added or removed, which takes milliseconds at this corpus size.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        self._postings = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, ids, documents):
+        for chunk_id, doc in zip(ids, documents):
+            self.docs[chunk_id] = {"text": doc.page_content, "metadata": doc.metadata}
+        self._postings = None
+
+    def remove(self, ids):
+        for chunk_id in ids:
+            self.docs.pop(chunk_id, None)
+        self._postings = None
+
+    def _build(self):
+        postings = defaultdict(list)
+        lengths = {}
+        for chunk_id, doc in self.docs.items():
+            terms = Counter(tokenize(doc["text"]))
+            lengths[chunk_id] = sum(terms.values())
+            for term, frequency in terms.items():
+                postings[term].append((chunk_id, frequency))
+        average = sum(lengths.values()) / len(lengths) if lengths else 0.0
+        return postings, lengths, average
+
+    def search(self, query, k):
+        """Return up to `k` (chunk_id, score) pairs, best first."""
+        with self._lock:
+            if self._postings is None:
+                self._postings = self._build()
+            postings, lengths, average = self._postings
+
+        total = len(lengths)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            matches = postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + (total - len(matches) + 0.5) / (len(matches) + 0.5))
+            for chunk_id, frequency in matches:
+                norm = 1 - self.b + self.b * lengths[chunk_id] / average
+                scores[chunk_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def document(self, chunk_id):
+        doc = self.docs[chunk_id]
+        return Document(page_content=doc["text"], metadata=doc["metadata"])
+
+    def save(self, path):
+        file_path = os.path.join(path, BM25_FILE)
+        with open(file_path + ".tmp", "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": self.docs}, f)
+        os.replace(file_path + ".tmp", file_path)
+
+    @classmethod
+    def load(cls, path):
+        file_path = os.path.join(path, BM25_FILE)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path) as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.docs = data["docs"]
+        return index
+
+
+def reciprocal_rank_fusion(result_lists, k, rrf_k=60):
+    """Fuse ranked document lists; a document's score is sum(1 / (rrf_k + rank))."""
+    scores = defaultdict(float)
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = chunk_key(doc)
+            scores[key] += 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense + BM25 retrieval fused with reciprocal rank fusion.
+
+    Each stage fetches `fetch_k` candidates; the best `k` fused results are
+    returned. Per-stage timings of the last query are kept in `last_timings`
+    and logged at debug level.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: Any
+    keyword_index: BM25Index
+    k: int = 3
+    fetch_k: int = 10
+    rrf_k: int = 60
+    last_timings: Optional[dict] = None
+
+    @property
+    def search_kwargs(self):
+        # Read by the retrieval cache in custom_tools.py
+        return {"k": self.k}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        began = time.perf_counter()
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        dense_done = time.perf_counter()
+        keyword = [
+            self.keyword_index.document(chunk_id)
+            for chunk_id, _ in self.keyword_index.search(query, self.fetch_k)
+        ]
+        keyword_done = time.perf_counter()
+        docs = reciprocal_rank_fusion([dense, keyword], self.k, self.rrf_k)
+        fused = time.perf_counter()
+
+        self.last_timings = {
+            "dense_ms": (dense_done - began) * 1000,
+            "bm25_ms": (keyword_done - dense_done) * 1000,
+            "fusion_ms": (fused - keyword_done) * 1000,
+        }
+        logger.debug("hybrid retrieval timings: %s", self.last_timings)
+        telemetry.observe("search.dense", dense_done - began)
+        telemetry.observe("search.bm25", keyword_done - dense_done)
+        return docs
@@ -0,0 +1,134 @@
+"""Client side of the index server (see index_server.py).
+
+With FITAI_INDEX_SERVER_URL set, app processes do not load the embedding
+model or open the index themselves: `RemoteEmbeddings` and
+`RemoteRetriever` forward to the sidecar over loopback HTTP, and
+`RemoteKnowledgeBase` stands in for vector_index.KnowledgeBase.
+"""
+import json
+import threading
+from http.client import BadStatusLine, HTTPConnection
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+import settings
+
+
+# What a request on an idle keep-alive connection the server has closed
+# raises (RemoteDisconnected is both a BadStatusLine and a ConnectionResetError).
+STALE_CONNECTION_ERRORS = (BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class IndexServerError(RuntimeError):
+    pass
+
+
+class IndexServerClient:
+    """JSON over HTTP/1.1 with one keep-alive connection per thread."""
+
+    def __init__(self, url=None, timeout=None):
+        parts = urlsplit(url or settings.INDEX_SERVER_URL)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout or settings.INDEX_SERVER_TIMEOUT
+        self._local = threading.local()
+
+    def _connection(self):
+        """The thread's connection, and whether it has served a request before."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+            return connection, False
+        return connection, True
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        # One retry, and only when a reused keep-alive connection turns out to
+        # have been closed by the server. Timeouts and other errors propagate:
+        # the request may still be running on the server.
+        for attempt in range(2):
+            connection, reused = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except Exception as e:
+                connection.close()
+                self._local.connection = None
+                if attempt or not reused or not isinstance(e, STALE_CONNECTION_ERRORS):
+                    raise
+        if response.status != 200:
+            raise IndexServerError(f"{method} {path}: HTTP {response.status}: {data[:200]!r}")
+        return json.loads(data)
+
+    def info(self):
+        return self.request("GET", "/info")
+
+    def embed(self, texts, kind):
+        return self.request("POST", "/embed", {"texts": texts, "kind": kind})["vectors"]
+
+    def search(self, query, k):
+        result = self.request("POST", "/search", {"query": query, "k": k})
+        return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in result["documents"]]
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by the index server's model."""
+
+    def __init__(self, client=None):
+        self.client = client or IndexServerClient()
+
+    def embed_documents(self, texts):
+        return self.client.embed(list(texts), "documents")
+
+    def embed_query(self, text):
+        return self.client.embed([text], "query")[0]
+
+
+class RemoteRetriever(BaseRetriever):
+    """Retrieval (dense, hybrid and/or re-ranked, as the server is configured) on the index server."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    client: Any
+    k: int = 3
+
+    @property
+    def search_kwargs(self):
+        # Read by the retrieval cache in custom_tools.py
+        return {"k": self.k}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return self.client.search(query, self.k)
+
+
+class RemoteKnowledgeBase:
+    """The index as seen through the server: version, PDF count and retriever."""
+
+    def __init__(self, client, info):
+        self.client = client
+        self.version = info["version"]
+        self.doc_count = info["doc_count"]
+        self.info = info
+
+    def make_retriever(self, k: Optional[int] = None):
+        return RemoteRetriever(client=self.client, k=k or settings.RETRIEVAL_K)
+
+
+def connect(url=None, client=None):
+    """RemoteKnowledgeBase for the server at `url` (or `client`), or None if it has no index."""
+    client = client or IndexServerClient(url)
+    info = client.info()
+    if not info.get("ready"):
+        return None
+    return RemoteKnowledgeBase(client, info)
@@ -0,0 +1,211 @@
+"""Sidecar that serves the embedding model and the index to app processes.
+
+Without it, every app process loads its own copy of the sentence-transformers
+model and opens its own copy of the index. Run one server per host and point
+the app processes at it with FITAI_INDEX_SERVER_URL; they then only need
+a small HTTP client (index_client.py):
+
+    python index_server.py                      # 127.0.0.1:8765
+    FITAI_INDEX_SERVER_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Endpoints (JSON):
+    GET  /info    index version, PDF and chunk counts, embedding model,
+                  query batch-size histogram
+    GET  /healthz 200 while the server is up
+    GET  /readyz  200 once the model and index are loaded, else 503
+    GET  /metrics spans, counters and gauges in the Prometheus text format
+    POST /embed   {"texts": [...], "kind": "query" | "documents"} -> {"vectors": [...]}
+    POST /search  {"query": "...", "k": 3} -> {"documents": [...], "version": "..."}
+
+The server binds to loopback by default and starts loading the model and
+the index in the background right away; /info and /search wait up to
+FITAI_WARMUP_WAIT seconds for that load, then answer 503. When the PDFs
+change, the next /info call syncs the index (unless FITAI_INDEX_READ_ONLY=1),
+the same way the app does on its own.
+"""
+import argparse
+import json
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+import telemetry
+import vector_index
+from warmup import IndexWarmup
+
+logger = logging.getLogger(__name__)
+
+
+class IndexService:
+    """The embedding model, the opened index and one retriever per k.
+
+    Both are loaded in a background thread (warmup.IndexWarmup) as soon as the
+    service is created, so the server accepts connections, and answers
+    /healthz and /readyz, while the model loads and the index syncs.
+    """
+
+    def __init__(self):
+        self.embeddings = None
+        self.knowledge_base = None
+        self._retrievers = {}
+        self._embeddings_lock = threading.Lock()
+        self.warmup = IndexWarmup(self._load, vector_index.corpus_fingerprint, settings.CORPUS_CHECK_INTERVAL)
+        self.warmup.start(refresh=False)
+
+    def get_embeddings(self):
+        # Shared by the warm-up and /embed requests that arrive before it is done.
+        with self._embeddings_lock:
+            if self.embeddings is None:
+                embeddings = vector_index.get_embeddings()
+                if hasattr(embeddings, "stats"):
+                    telemetry.register("query_batches", embeddings.stats)
+                self.embeddings = embeddings
+        return self.embeddings
+
+    def _load(self):
+        knowledge_base = vector_index.load_index(
+            embeddings=self.get_embeddings(),
+            sync=not settings.INDEX_READ_ONLY,
+        )
+        self.knowledge_base = knowledge_base
+        self._retrievers = {}
+        logger.info("index opened: %s", self.info())
+        return knowledge_base
+
+    def refresh(self, timeout=None):
+        """Wait for the index of the current PDFs, syncing it first if they changed."""
+        try:
+            self.warmup.get(settings.WARMUP_WAIT if timeout is None else timeout)
+        except FutureTimeoutError:
+            raise LookupError("index is still loading") from None
+
+    def retriever(self, k):
+        retriever = self._retrievers.get(k)
+        if retriever is None:
+            retriever = self._retrievers[k] = vector_index.make_retriever(self.knowledge_base, k=k)
+        return retriever
+
+    def info(self):
+        knowledge_base = self.knowledge_base
+        if knowledge_base is None:
+            return {"ready": False, "warmup": self.warmup.status()}
+        return {
+            "ready": True,
+            "version": knowledge_base.version,
+            "doc_count": knowledge_base.doc_count,
+            "chunks": vector_index.manifest_chunk_count(knowledge_base.manifest),
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "query_batches": self.embeddings.stats() if hasattr(self.embeddings, "stats") else None,
+        }
+
+    def embed(self, texts, kind):
+        embeddings = self.get_embeddings()
+        if kind == "query" and len(texts) == 1:
+            # Single queries from concurrent requests are batched together.
+            return [embeddings.embed_query(texts[0])]
+        return embeddings.embed_documents(texts)
+
+    def search(self, query, k):
+        if self.knowledge_base is None:
+            self.refresh()
+        if self.knowledge_base is None:
+            raise LookupError("no index")
+        with telemetry.span("server.search"):
+            docs = self.retriever(k).invoke(query)
+        return {
+            "documents": [{"page_content": d.page_content, "metadata": d.metadata} for d in docs],
+            "version": self.knowledge_base.version,
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, keep-alive
+    # requests wait on delayed ACKs.
+    disable_nagle_algorithm = True
+    service = None
+
+    def _send(self, status, payload, content_type="application/json"):
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _payload(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/info":
+            try:
+                self.service.refresh()
+            except LookupError as e:
+                self._send(503, {"error": str(e), **self.service.info()})
+                return
+            except Exception as e:
+                # The warm-up failed (unreadable PDF, model download, ...); its
+                # status carries the error until a later refresh succeeds.
+                logger.exception("index load failed")
+                self._send(503, {"error": str(e), **self.service.info()})
+                return
+            self._send(200, self.service.info())
+        elif self.path == "/healthz":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/readyz":
+            status = self.service.warmup.status()
+            self._send(200 if status["state"] == "ready" else 503, status)
+        elif self.path == "/metrics":
+            self._send(200, telemetry.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            payload = self._payload()
+            if self.path == "/embed":
+                self._send(200, {"vectors": self.service.embed(payload["texts"], payload.get("kind", "documents"))})
+            elif self.path == "/search":
+                self._send(200, self.service.search(payload["query"], int(payload.get("k", settings.RETRIEVAL_K))))
+            else:
+                self._send(404, {"error": "not found"})
+        except (KeyError, ValueError) as e:
+            self._send(400, {"error": str(e)})
+        except LookupError as e:
+            self._send(503, {"error": str(e)})
+        except Exception as e:
+            logger.exception("request to %s failed", self.path)
+            self._send(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def make_server(host=None, port=None, service=None):
+    handler = type("IndexHandler", (Handler,), {"service": service or IndexService()})
+    server = ThreadingHTTPServer((host or settings.INDEX_SERVER_HOST, port or settings.INDEX_SERVER_PORT), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the embedding model and index to app processes.")
+    parser.add_argument("--host", default=settings.INDEX_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.INDEX_SERVER_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(args.host, args.port)
+    print(f"Index server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+"""Parallel PDF parsing and chunking.
+
+Files are cut into page ranges which are parsed inside a process pool, so
+large PDFs are spread over several cores instead of one. Once all pages of a
+file are in, repeated headers and footers are stripped, the pages are split
+and duplicate chunks dropped (see dedup.py); that needs the whole file and
+is cheap next to the parsing. Results come back one file at a time, in
+completion order, with per-file timings and dedup counts.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import dedup
+import settings
+
+
+def _text_splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        # Lets the retriever tool merge overlapping chunks of a page.
+        add_start_index=True,
+    )
+
+
+def count_pages(path):
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def parse_page_range(path, start, stop):
+    """Parse pages [start, stop) of `path`.
+
+    Runs in a worker process; returns (pages, seconds).
+    """
+    from langchain_core.documents import Document
+    from pypdf import PdfReader
+
+    began = time.perf_counter()
+    reader = PdfReader(path)
+    total_pages = len(reader.pages)
+
+    pages = [
+        Document(
+            page_content=reader.pages[page_number].extract_text(),
+            metadata={"source": path, "page": page_number, "total_pages": total_pages},
+        )
+        for page_number in range(start, stop)
+    ]
+    return pages, time.perf_counter() - began
+
+
+def chunk_pages(pages):
+    """Strip page furniture, split and deduplicate one file's pages.
+
+    Returns (chunks, stats) where `stats` counts what dedup removed.
+    """
+    # Imported here: chunk_pages runs in the parent process only, and the
+    # spawned parse workers should not pay for importing it.
+    import telemetry
+
+    stats = {"furniture_lines": 0, "exact_duplicates": 0, "near_duplicates": 0}
+    with telemetry.span("index.split"):
+        if settings.DEDUP_ENABLED:
+            pages, stats["furniture_lines"] = dedup.strip_page_furniture(pages)
+        chunks = _text_splitter().split_documents(pages)
+        if settings.DEDUP_ENABLED:
+            chunks, stats["exact_duplicates"], stats["near_duplicates"] = dedup.dedupe_chunks(chunks)
+    return chunks, stats
+
+
+def page_ranges(page_count, pages_per_task):
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+
+def iter_file_chunks(paths, workers=None, pages_per_task=None):
+    """Yield (path, chunks, stats) for each PDF as soon as all of its pages are done.
+
+    `stats` has the page count, the wall-clock seconds from the first task
+    being queued to the last one finishing (plus chunking), the summed worker
+    CPU seconds and the dedup counts of `chunk_pages`. Time the caller spends
+    on earlier files after the last range is done is not counted.
+    """
+    workers = workers or settings.INGEST_WORKERS
+    pages_per_task = pages_per_task or settings.INGEST_PAGES_PER_TASK
+
+    if workers <= 1:
+        for path in paths:
+            began = time.perf_counter()
+            page_count = count_pages(path)
+            pages, seconds = parse_page_range(path, 0, page_count)
+            chunks, stats = chunk_pages(pages)
+            yield path, chunks, {
+                "pages": page_count,
+                "wall_seconds": time.perf_counter() - began,
+                "cpu_seconds": seconds,
+                **stats,
+            }
+        return
+
+    # "spawn" rather than fork: the parent may already hold the embedding model
+    # and its thread pools, which do not survive a fork safely.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        files = {}
+        tasks = []
+        # Queue the biggest files first so their page ranges start early and
+        # the small files fill in the gaps instead of delaying them.
+        for path in sorted(paths, key=os.path.getsize, reverse=True):
+            ranges = page_ranges(count_pages(path), pages_per_task)
+            if not ranges:
+                yield path, [], {"pages": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, **chunk_pages([])[1]}
+                continue
+            files[path] = {
+                "parts": {},
+                "remaining": len(ranges),
+                "pages": ranges[-1][1],
+                "queued": None,
+                "done": 0.0,
+                "cpu_seconds": 0.0,
+            }
+            tasks.extend((path, start, stop) for start, stop in ranges)
+
+        # Only keep a small window of ranges in flight: while the caller is busy
+        # embedding, parsed pages must not pile up in memory.
+        tasks = iter(tasks)
+        futures = {}
+        finished = {}
+
+        def submit_next():
+            task = next(tasks, None)
+            if task is None:
+                return
+            path, start, stop = task
+            if files[path]["queued"] is None:
+                files[path]["queued"] = time.perf_counter()
+            future = pool.submit(parse_page_range, path, start, stop)
+            # Stamped by the pool's thread when the range is done, not when this
+            # generator resumes: the caller may have been embedding meanwhile.
+            future.add_done_callback(lambda f: finished.__setitem__(f, time.perf_counter()))
+            futures[future] = (path, start)
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, start = futures.pop(future)
+                submit_next()
+                state = files[path]
+                pages, seconds = future.result()
+                state["parts"][start] = pages
+                state["cpu_seconds"] += seconds
+                state["done"] = max(state["done"], finished.pop(future))
+                state["remaining"] -= 1
+                if state["remaining"]:
+                    continue
+
+                # Reassemble in page order so chunk IDs stay deterministic.
+                ordered = [page for key in sorted(state["parts"]) for page in state["parts"][key]]
+                del files[path]
+                began = time.perf_counter()
+                chunks, stats = chunk_pages(ordered)
+                yield path, chunks, {
+                    "pages": state["pages"],
+                    "wall_seconds": state["done"] - state["queued"] + time.perf_counter() - began,
+                    "cpu_seconds": state["cpu_seconds"],
+                    **stats,
+                }
@@ -0,0 +1,431 @@
+"""A small in-process vector store on a memory-mapped NumPy matrix.
+
+For a corpus of a few thousand chunks, Chroma's client, SQLite and HNSW
+index cost more at startup than the search itself. `NumpyVectorStore` keeps
+unit-length float32 vectors in one contiguous ``vectors.npy`` that is
+memory-mapped on open, and the texts and metadata in ``records.json``.
+A query is a single matrix-vector product followed by ``argpartition``.
+
+Two options help larger corpora:
+
+- ``index="ivf"``: vectors are clustered with spherical k-means and a query
+  only scores the rows of its `nprobe` nearest clusters. The clustering is
+  stored in ``ivf.npz`` and rebuilt after the vectors change.
+- ``int8=True``: search runs on int8 codes (per-dimension scales) instead
+  of float32, a quarter of the memory traffic at a small loss of precision.
+
+Writes are staged in memory and persisted by `flush()`; inside
+``with store.batch_writes():`` that happens once at the end, so a whole index
+sync rewrites the files once, and rows added in the meantime wait in a
+spill file rather than in memory. Searches read the last flushed generation,
+published as one immutable `_Snapshot`.
+
+Select it with FITAI_VECTOR_BACKEND=numpy (see vector_index.open_vectorstore).
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+IVF_FILE = "ivf.npz"
+PENDING_FILE = "vectors.pending"
+
+# Rows scored per block in int8 mode and during k-means, to bound temporaries.
+BLOCK_ROWS = 65536
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores, k):
+    """Indices of the `k` largest scores along the last axis, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1)
+    return np.take_along_axis(top, order, axis=-1)
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _open_vectors(path, rows):
+    # An empty array cannot be memory-mapped.
+    return np.load(path, mmap_mode="r" if rows else None)
+
+
+def spherical_kmeans(vectors, clusters, iterations=10, seed=0):
+    """Cluster unit vectors by cosine similarity. Returns (centroids, assignment)."""
+    rng = np.random.default_rng(seed)
+    centroids = np.array(vectors[rng.choice(len(vectors), clusters, replace=False)])
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        sums = np.zeros_like(centroids)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS])
+            labels = np.argmax(block @ centroids.T, axis=1)
+            assignment[start:start + len(block)] = labels
+            np.add.at(sums, labels, block)
+        filled = np.bincount(assignment, minlength=clusters) > 0
+        # Empty clusters keep their previous centroid.
+        centroids[filled] = _normalize(sums[filled])
+    return centroids, assignment
+
+
+class _Snapshot:
+    """One flushed generation of the store.
+
+    Never changed once published, apart from the search structures built
+    lazily from it (int8 codes, IVF clusters).
+    """
+
+    def __init__(self, generation, ids, texts, metadatas, vectors):
+        self.generation = generation
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self.codes = self.scales = None
+        self.ivf = None
+
+
+class _PendingWrites:
+    """Changes staged since the last flush: rows dropped from the snapshot and rows appended.
+
+    Appended vectors are spilled to `spill_path` rather than kept in memory.
+    """
+
+    def __init__(self, spill_path):
+        self.spill_path = spill_path
+        self.dropped = set()
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.positions = {}
+        self.dim = None
+        self._spill = None
+
+    def __bool__(self):
+        return bool(self.dropped or self.positions)
+
+    def append(self, chunk_id, text, metadata, vector):
+        if self._spill is None:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            self._spill = open(self.spill_path, "wb")
+            self.dim = len(vector)
+        self._spill.write(np.asarray(vector, dtype=np.float32).tobytes())
+        self.positions[chunk_id] = len(self.ids)
+        self.ids.append(chunk_id)
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+
+    def vectors(self):
+        """The appended vectors, memory-mapped."""
+        self._spill.close()
+        return np.memmap(self.spill_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+
+    def discard(self):
+        if self._spill is not None:
+            self._spill.close()
+            os.remove(self.spill_path)
+            self._spill = None
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact (or IVF-approximate) cosine search over a memory-mapped matrix.
+
+    Args:
+        path: Directory holding the store's files; created on first write.
+        embedding_function: Embeddings used for documents and queries.
+        index: "flat" scores every row; "ivf" only the probed clusters.
+        nprobe: Clusters searched per query in "ivf" mode.
+        int8: Search on int8-quantized vectors.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding_function: Embeddings,
+        index: str = "flat",
+        nprobe: int = 8,
+        int8: bool = False,
+    ) -> None:
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown index type: {index!r}")
+        self.path = path
+        self._embedding = embedding_function
+        self.index = index
+        self.nprobe = nprobe
+        self.int8 = int8
+        self._lock = threading.RLock()
+        self._pending = self._new_pending()
+        self._batch_depth = 0
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self):
+        return len(self._state.ids)
+
+    # --- Storage ---
+
+    def _load(self):
+        records_path = os.path.join(self.path, RECORDS_FILE)
+        if os.path.exists(records_path):
+            with open(records_path) as f:
+                records = json.load(f)
+            vectors = _open_vectors(os.path.join(self.path, VECTORS_FILE), len(records["ids"]))
+        else:
+            records = {"generation": 0, "ids": [], "texts": [], "metadatas": []}
+            vectors = np.empty((0, 0), dtype=np.float32)
+        self._state = _Snapshot(records["generation"], records["ids"], records["texts"], records["metadatas"], vectors)
+
+    def _new_pending(self):
+        return _PendingWrites(os.path.join(self.path, PENDING_FILE))
+
+    def flush(self):
+        """Persist the staged writes as a new generation and publish it."""
+        with self._lock:
+            pending, state = self._pending, self._state
+            if not pending:
+                pending.discard()
+                self._pending = self._new_pending()
+                return
+            keep = [row for row in range(len(state.ids)) if row not in pending.dropped]
+            added = [i for i in range(len(pending.ids)) if pending.positions.get(pending.ids[i]) == i]
+            ids = [state.ids[row] for row in keep] + [pending.ids[i] for i in added]
+            texts = [state.texts[row] for row in keep] + [pending.texts[i] for i in added]
+            metadatas = [state.metadatas[row] for row in keep] + [pending.metadatas[i] for i in added]
+            dim = state.vectors.shape[1] if len(state.ids) else (pending.dim or 0)
+            appended = pending.vectors() if pending.ids else None
+
+            os.makedirs(self.path, exist_ok=True)
+            vectors_path = os.path.join(self.path, VECTORS_FILE)
+            # Vectors first: records.json is what makes a new generation visible.
+            # They are copied block by block from the memory map, never all in RAM.
+            tmp_path = vectors_path + ".tmp"
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(ids), dim))
+            row = 0
+            for start in range(0, len(keep), BLOCK_ROWS):
+                block = keep[start:start + BLOCK_ROWS]
+                out[row:row + len(block)] = state.vectors[block]
+                row += len(block)
+            for start in range(0, len(added), BLOCK_ROWS):
+                block = added[start:start + BLOCK_ROWS]
+                out[row:row + len(block)] = appended[block]
+                row += len(block)
+            out.flush()
+            del out, appended
+            os.replace(tmp_path, vectors_path)
+
+            records = {"generation": state.generation + 1, "ids": ids, "texts": texts, "metadatas": metadatas}
+            _write_atomic(
+                os.path.join(self.path, RECORDS_FILE),
+                lambda f: f.write(json.dumps(records).encode()),
+            )
+            self._state = _Snapshot(records["generation"], ids, texts, metadatas, _open_vectors(vectors_path, len(ids)))
+            pending.discard()
+            self._pending = self._new_pending()
+
+    @contextmanager
+    def batch_writes(self):
+        """Stage every write in the block and flush once when it ends without error."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._pending.discard()
+                    self._pending = self._new_pending()
+            raise
+        with self._lock:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+
+    def _quantized(self, state):
+        if state.codes is None:
+            scales = np.zeros(state.vectors.shape[1], dtype=np.float32)
+            for start in range(0, len(state.vectors), BLOCK_ROWS):
+                block = np.abs(state.vectors[start:start + BLOCK_ROWS]).max(axis=0)
+                np.maximum(scales, block, out=scales)
+            scales = np.maximum(scales, 1e-12) / 127
+            state.codes = np.rint(state.vectors / scales).astype(np.int8)
+            state.scales = scales
+        return state.codes, state.scales
+
+    def _clusters(self, state):
+        """(centroids, row order, offsets) of the IVF index, built or loaded lazily."""
+        if state.ivf is not None:
+            return state.ivf
+        ivf_path = os.path.join(self.path, IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as data:
+                if int(data["generation"]) == state.generation:
+                    state.ivf = (data["centroids"], data["order"], data["offsets"])
+                    return state.ivf
+
+        clusters = max(1, int(np.sqrt(len(state.ids))))
+        centroids, assignment = spherical_kmeans(state.vectors, clusters)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=clusters))])
+        with self._lock:
+            if state is self._state:
+                _write_atomic(ivf_path, lambda f: np.savez(
+                    f, generation=state.generation, centroids=centroids, order=order, offsets=offsets
+                ))
+        state.ivf = (centroids, order, offsets)
+        return state.ivf
+
+    # --- Search ---
+
+    def _score(self, state, queries, rows=None):
+        """Cosine scores of `queries` (q x d) against all rows or the given rows."""
+        if self.int8:
+            codes, scales = self._quantized(state)
+            codes = codes if rows is None else codes[rows]
+            weighted = queries * scales
+            return np.concatenate([
+                weighted @ codes[start:start + BLOCK_ROWS].T.astype(np.float32)
+                for start in range(0, max(len(codes), 1), BLOCK_ROWS)
+            ], axis=1)
+        vectors = state.vectors if rows is None else state.vectors[rows]
+        return queries @ vectors.T
+
+    def _search(self, state, query_vectors, k):
+        queries = _normalize(np.atleast_2d(query_vectors))
+        if not state.ids:
+            return [[] for _ in queries]
+
+        if self.index == "flat":
+            scores = self._score(state, queries)
+            top = _top_k(scores, k)
+            return [
+                [(int(row), float(scores[i, row])) for row in top[i]]
+                for i in range(len(queries))
+            ]
+
+        centroids, order, offsets = self._clusters(state)
+        probes = _top_k(queries @ centroids.T, self.nprobe)
+        results = []
+        for query, clusters in zip(queries, probes):
+            rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in clusters])
+            scores = self._score(state, query[None, :], rows)[0]
+            results.append([(int(rows[i]), float(scores[i])) for i in _top_k(scores, k)])
+        return results
+
+    def search_vectors(self, query_vectors, k=4):
+        """Top-`k` (row, score) lists for a batch of query vectors."""
+        return self._search(self._state, query_vectors, k)
+
+    @staticmethod
+    def _document(state, row):
+        return Document(id=state.ids[row], page_content=state.texts[row], metadata=state.metadatas[row])
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs: Any):
+        state = self._state
+        return [(self._document(state, row), score) for row, score in self._search(state, embedding, k)[0]]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs: Any):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs: Any):
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs: Any):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities.
+        return lambda score: score
+
+    # --- Writes ---
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            raise ValueError("NumpyVectorStore needs explicit ids.")
+        embedded = _normalize(self._embedding.embed_documents(texts))
+
+        with self.batch_writes(), self._lock:
+            pending, state = self._pending, self._state
+            for i, chunk_id in enumerate(ids):
+                # Re-adding an id replaces its row.
+                row = state.rows.get(chunk_id)
+                if row is not None:
+                    pending.dropped.add(row)
+                pending.append(chunk_id, texts[i], metadatas[i], embedded[i])
+        return list(ids)
+
+    def delete(self, ids: Optional[list[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self.batch_writes(), self._lock:
+            pending, state = self._pending, self._state
+            found = False
+            for chunk_id in ids:
+                row = state.rows.get(chunk_id)
+                if row is not None and row not in pending.dropped:
+                    pending.dropped.add(row)
+                    found = True
+                if pending.positions.pop(chunk_id, None) is not None:
+                    found = True
+        return found
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        """Stored chunks, in the shape of Chroma's `get`."""
+        state = self._state
+        rows = range(len(state.ids)) if ids is None else [state.rows[i] for i in ids if i in state.rows]
+        result = {"ids": [state.ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [state.texts[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [state.metadatas[row] for row in rows]
+        return result
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        if path is None:
+            raise ValueError("NumpyVectorStore.from_texts needs a `path`.")
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids or [str(i) for i in range(len(texts))])
+        return store
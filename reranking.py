@@ -0,0 +1,134 @@
+"""Cross-encoder re-ranking of retrieved chunks, within a latency budget.
+
+The first-stage retriever over-fetches candidates (20 by default) and a small
+cross-encoder scores each (query, chunk) pair together, which ranks far more
+precisely than comparing two independently computed embeddings. Only the
+best `k` chunks are returned.
+
+Scoring cost grows with the number of candidates, so the re-ranker keeps a
+moving average of the cost per pair and scores only as many candidates as
+fit in what is left of the per-query budget. When not even `k` candidates
+fit, re-ranking is skipped and the first-stage order is kept.
+"""
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Scores (query, document) pairs with a sentence-transformers CrossEncoder.
+
+    The model is loaded on first use. `ms_per_pair` is an exponential moving
+    average of the measured scoring cost, None until the first call.
+    """
+
+    def __init__(self, model_name=None, batch_size=32, smoothing=0.2):
+        self.model_name = model_name or settings.RERANK_MODEL
+        self.batch_size = batch_size
+        self.smoothing = smoothing
+        self.ms_per_pair = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name)
+            return self._model
+
+    def affordable(self, budget_ms):
+        """How many pairs can be scored in `budget_ms`; None when unknown yet."""
+        if self.ms_per_pair is None:
+            return None
+        return int(budget_ms // self.ms_per_pair) if self.ms_per_pair > 0 else None
+
+    def score(self, query, docs):
+        model = self._load()
+        began = time.perf_counter()
+        scores = model.predict(
+            [(query, doc.page_content) for doc in docs],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        measured = (time.perf_counter() - began) * 1000 / max(len(docs), 1)
+        with self._lock:
+            if self.ms_per_pair is None:
+                self.ms_per_pair = measured
+            else:
+                self.ms_per_pair += self.smoothing * (measured - self.ms_per_pair)
+        return [float(score) for score in scores]
+
+
+class RerankingRetriever(BaseRetriever):
+    """Over-fetch with `base_retriever`, re-rank with `reranker`, keep `k`.
+
+    `base_retriever` must already be configured to return the candidates
+    (see vector_index.make_retriever). `budget_ms` is the latency budget of
+    the whole query, first stage included; 0 disables the budget. The first
+    query scores every candidate, which measures the cost. Timings and
+    whether re-ranking ran are kept in `last_timings`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    base_retriever: BaseRetriever
+    reranker: Any
+    k: int = 3
+    budget_ms: float = 0
+    last_timings: Optional[dict] = None
+
+    @property
+    def search_kwargs(self):
+        # Read by the retrieval cache in custom_tools.py
+        return {"k": self.k}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        began = time.perf_counter()
+        candidates = self.base_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        fetch_ms = (time.perf_counter() - began) * 1000
+
+        count = len(candidates)
+        if self.budget_ms:
+            affordable = self.reranker.affordable(self.budget_ms - fetch_ms)
+            if affordable is not None:
+                count = min(count, affordable)
+
+        if not candidates:
+            docs = []
+            reranked = False
+        elif count < min(self.k, len(candidates)):
+            docs = candidates[:self.k]
+            reranked = False
+            logger.info(
+                "re-ranking skipped: %.0f ms budget, %.0f ms spent fetching, ~%.1f ms per pair",
+                self.budget_ms, fetch_ms, self.reranker.ms_per_pair,
+            )
+        else:
+            head = candidates[:count]
+            scores = self.reranker.score(query, head)
+            order = sorted(range(len(head)), key=lambda i: scores[i], reverse=True)
+            docs = ([head[i] for i in order] + candidates[count:])[:self.k]
+            reranked = True
+
+        self.last_timings = {
+            "fetch_ms": fetch_ms,
+            "rerank_ms": (time.perf_counter() - began) * 1000 - fetch_ms,
+            "candidates": len(candidates),
+            "reranked": count if reranked else 0,
+        }
+        logger.debug("re-ranking timings: %s", self.last_timings)
+        return docs
@@ -0,0 +1,153 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Knowledge Base ---
+PDF_DIR = os.getenv("FITAI_PDF_DIR", "data/fitness_pdfs/")
+INDEX_DIR = os.getenv("FITAI_INDEX_DIR", "data/vector_index/")
+
+# Splitter and embedding settings are part of the index key, so changing any
+# of them makes the app build (or open) a different index.
+CHUNK_SIZE = int(os.getenv("FITAI_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("FITAI_CHUNK_OVERLAP", "200"))
+# "english" is small and fast but only understands English queries; the
+# "multilingual" model maps Turkish questions next to the English chunks that
+# answer them. Each model gets its own index. FITAI_EMBEDDING_MODEL overrides
+# the preset with any sentence-transformers model.
+EMBEDDING_PRESETS = {
+    "english": "sentence-transformers/all-MiniLM-L6-v2",
+    "multilingual": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+}
+EMBEDDING_PRESET = os.getenv("FITAI_EMBEDDING_PRESET", "english")
+EMBEDDING_MODEL = os.getenv("FITAI_EMBEDDING_MODEL") or EMBEDDING_PRESETS[EMBEDDING_PRESET]
+
+# "chroma": Chroma vector store. "numpy": memory-mapped NumPy matrix (numpy_store.py),
+# which opens much faster; NUMPY_INDEX "ivf" searches only the NUMPY_IVF_NPROBE
+# nearest clusters, and NUMPY_INT8 searches int8-quantized vectors.
+VECTOR_BACKEND = os.getenv("FITAI_VECTOR_BACKEND", "chroma")
+NUMPY_INDEX = os.getenv("FITAI_NUMPY_INDEX", "flat")
+NUMPY_IVF_NPROBE = int(os.getenv("FITAI_NUMPY_IVF_NPROBE", "8"))
+NUMPY_INT8 = os.getenv("FITAI_NUMPY_INT8", "0") == "1"
+
+# Serving processes can be forbidden from embedding the corpus themselves;
+# the index must then be created ahead of time with `python build_index.py`.
+INDEX_READ_ONLY = os.getenv("FITAI_INDEX_READ_ONLY", "0") == "1"
+
+# --- Index Server ---
+# When set (e.g. http://127.0.0.1:8765), app processes use the embedding model
+# and index served by `python index_server.py` instead of loading their own.
+INDEX_SERVER_URL = os.getenv("FITAI_INDEX_SERVER_URL", "")
+INDEX_SERVER_HOST = os.getenv("FITAI_INDEX_SERVER_HOST", "127.0.0.1")
+INDEX_SERVER_PORT = int(os.getenv("FITAI_INDEX_SERVER_PORT", "8765"))
+INDEX_SERVER_TIMEOUT = float(os.getenv("FITAI_INDEX_SERVER_TIMEOUT", "30"))
+
+# --- Warm-up ---
+# The embedding model and index are loaded in a background thread at start-up
+# (warmup.py). /healthz and /readyz are served on HEALTH_PORT (0 = off) by the
+# app; the index server serves them on its own port. Index server requests
+# wait up to WARMUP_WAIT seconds for a load in progress before failing with 503.
+# Whether the PDFs (or the index server's version) changed is checked at most
+# once every CORPUS_CHECK_INTERVAL seconds. With WARMUP_AT_START off, the app
+# only loads them when the first question needs them.
+WARMUP_AT_START = os.getenv("FITAI_WARMUP", "1") == "1"
+HEALTH_HOST = os.getenv("FITAI_HEALTH_HOST", "127.0.0.1")
+HEALTH_PORT = int(os.getenv("FITAI_HEALTH_PORT", "0"))
+WARMUP_WAIT = float(os.getenv("FITAI_WARMUP_WAIT", "20"))
+CORPUS_CHECK_INTERVAL = float(os.getenv("FITAI_CORPUS_CHECK_INTERVAL", "5"))
+
+# --- Ingestion ---
+# PDFs are parsed and split in a process pool; large files are cut into page
+# ranges of this size so they spread over several workers. Each worker imports
+# pypdf and holds its page batches, so the default stays at 4 even on hosts
+# with many cores; raise it where memory allows.
+INGEST_WORKERS = int(os.getenv("FITAI_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_PAGES_PER_TASK = int(os.getenv("FITAI_INGEST_PAGES_PER_TASK", "8"))
+
+# Repeated headers/footers are stripped and duplicate chunks dropped before
+# embedding (dedup.py). A header or footer line is furniture when it appears
+# on at least this share of a file's pages; chunks whose SimHash differs in at
+# most DEDUP_SIMHASH_DISTANCE bits count as near duplicates (-1 disables).
+DEDUP_ENABLED = os.getenv("FITAI_DEDUP", "1") == "1"
+DEDUP_FURNITURE_SHARE = float(os.getenv("FITAI_DEDUP_FURNITURE_SHARE", "0.5"))
+DEDUP_SIMHASH_DISTANCE = int(os.getenv("FITAI_DEDUP_SIMHASH_DISTANCE", "3"))
+
+# Chunks are embedded and written to the index in batches of this size, so
+# peak memory during indexing does not grow with the corpus.
+EMBED_BATCH_SIZE = int(os.getenv("FITAI_EMBED_BATCH_SIZE", "64"))
+# Torch intra-op threads used by the embedding model (0 = torch default).
+EMBED_THREADS = int(os.getenv("FITAI_EMBED_THREADS", "0"))
+# Concurrent query embeddings (one per search) are coalesced into a single
+# batch (embedding_batcher.py): after the first query arrives, the batcher
+# waits up to EMBED_QUERY_MAX_WAIT_MS for up to EMBED_QUERY_MAX_BATCH queries.
+EMBED_QUERY_BATCHING = os.getenv("FITAI_EMBED_QUERY_BATCHING", "1") == "1"
+EMBED_QUERY_MAX_BATCH = int(os.getenv("FITAI_EMBED_QUERY_MAX_BATCH", "32"))
+EMBED_QUERY_MAX_WAIT_MS = float(os.getenv("FITAI_EMBED_QUERY_MAX_WAIT_MS", "2"))
+
+# --- Retrieval ---
+RETRIEVAL_K = int(os.getenv("FITAI_RETRIEVAL_K", "3"))
+# "hybrid": dense + BM25 fused with reciprocal rank fusion; "dense": vectors only.
+RETRIEVAL_MODE = os.getenv("FITAI_RETRIEVAL_MODE", "hybrid")
+# Candidates fetched from each stage before fusion, and the RRF constant.
+RETRIEVAL_FETCH_K = int(os.getenv("FITAI_RETRIEVAL_FETCH_K", "10"))
+RETRIEVAL_RRF_K = int(os.getenv("FITAI_RETRIEVAL_RRF_K", "60"))
+# Optional cross-encoder re-ranking: RERANK_FETCH_K candidates are fetched and
+# re-scored, as many as fit in RERANK_BUDGET_MS per query (0 = no budget).
+RERANK_ENABLED = os.getenv("FITAI_RERANK", "0") == "1"
+RERANK_MODEL = os.getenv("FITAI_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_FETCH_K = int(os.getenv("FITAI_RERANK_FETCH_K", "20"))
+RERANK_BUDGET_MS = float(os.getenv("FITAI_RERANK_BUDGET_MS", "300"))
+# Approximate token budget of one retriever tool output. Overlapping chunks
+# of a page are merged first; 0 disables the limit.
+RETRIEVAL_CONTEXT_TOKENS = int(os.getenv("FITAI_RETRIEVAL_CONTEXT_TOKENS", "1000"))
+# Retriever results are cached per (normalized query, k, index version).
+RETRIEVAL_CACHE_SIZE = int(os.getenv("FITAI_RETRIEVAL_CACHE_SIZE", "256"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("FITAI_RETRIEVAL_CACHE_TTL", "3600"))
+
+# --- Answer Cache ---
+# Optional semantic cache of first-turn answers. A new first question whose
+# embedding is at least this similar to a cached one (same language, style
+# and index) is answered without calling the LLM.
+ANSWER_CACHE_ENABLED = os.getenv("FITAI_ANSWER_CACHE", "0") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("FITAI_ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_SIZE = int(os.getenv("FITAI_ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("FITAI_ANSWER_CACHE_TTL", "86400"))
+
+# --- Agent Execution ---
+# Run turns with ainvoke/astream on a background event loop, so several tool
+# calls of one model message are retrieved concurrently. Retrievals run in a
+# thread pool of RETRIEVAL_THREADS workers.
+AGENT_ASYNC = os.getenv("FITAI_AGENT_ASYNC", "1") == "1"
+RETRIEVAL_THREADS = int(os.getenv("FITAI_RETRIEVAL_THREADS", "4"))
+
+# --- Conversation History ---
+# Approximate token budget for system prompt + history sent on each model call.
+# Older tool outputs are shortened first, then the oldest turns are summarized.
+HISTORY_TOKEN_BUDGET = int(os.getenv("FITAI_HISTORY_TOKEN_BUDGET", "6000"))
+# Tool outputs of earlier turns are cut to this many characters.
+HISTORY_TOOL_OUTPUT_CHARS = int(os.getenv("FITAI_HISTORY_TOOL_OUTPUT_CHARS", "300"))
+
+# --- Chat Display ---
+# Messages drawn on each page run; older ones are behind a "show earlier"
+# button that reveals CHAT_WINDOW more at a time. 0 shows the whole chat.
+CHAT_WINDOW = int(os.getenv("FITAI_CHAT_WINDOW", "20"))
+
+# --- Checkpointer ---
+# "memory": in-process, evicts idle / least recently used threads.
+# "sqlite": persisted in CHECKPOINT_SQLITE_PATH (pip install langgraph-checkpoint-sqlite).
+CHECKPOINTER = os.getenv("FITAI_CHECKPOINTER", "memory")
+CHECKPOINT_MAX_THREADS = int(os.getenv("FITAI_CHECKPOINT_MAX_THREADS", "1000"))
+CHECKPOINT_IDLE_TTL = float(os.getenv("FITAI_CHECKPOINT_IDLE_TTL", str(6 * 3600)))
+CHECKPOINT_MAX_THREAD_BYTES = int(os.getenv("FITAI_CHECKPOINT_MAX_THREAD_BYTES", str(2 << 20)))
+CHECKPOINT_SQLITE_PATH = os.getenv("FITAI_CHECKPOINT_SQLITE_PATH", "data/checkpoints.sqlite")
+
+# --- Telemetry ---
+# Span durations, token counts and cache statistics are kept in memory
+# (telemetry.py). Optionally every span and turn is appended to a JSONL file
+# and/or served in the Prometheus text format on TELEMETRY_PORT (0 = off).
+# DEBUG_PANEL shows them in the sidebar.
+TELEMETRY_ENABLED = os.getenv("FITAI_TELEMETRY", "1") == "1"
+TELEMETRY_JSONL = os.getenv("FITAI_TELEMETRY_JSONL", "")
+TELEMETRY_HOST = os.getenv("FITAI_TELEMETRY_HOST", "127.0.0.1")
+TELEMETRY_PORT = int(os.getenv("FITAI_TELEMETRY_PORT", "0"))
+DEBUG_PANEL = os.getenv("FITAI_DEBUG_PANEL", "0") == "1"
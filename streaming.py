@@ -0,0 +1,175 @@
+"""Token-level streaming of agent answers.
+
+`stream_turn` runs one turn of the agent graph with ``stream_mode="messages"``
+and turns the model's token chunks into UI events. `ThinkingStreamParser`
+separates ``<thinking>`` … ``</thinking>`` reasoning from the answer while
+tokens arrive, even when a tag is split across chunks; `split_thinking` does
+the same for a complete response.
+
+`astream_turn` is the asyncio variant; `EventLoopThread` drives it from
+synchronous code.
+"""
+import asyncio
+import threading
+
+from langchain_core.messages import AIMessageChunk
+
+THINKING_START = "<thinking>"
+THINKING_END = "</thinking>"
+
+
+class ThinkingStreamParser:
+    """Incrementally splits streamed text into ("thinking", text) and ("answer", text) parts.
+
+    Text before ``<thinking>`` and after ``</thinking>`` is answer; text in
+    between is thinking.
+    """
+
+    def __init__(self):
+        self.in_thinking = False
+        self._buffer = ""
+
+    def _pending_tag(self):
+        return THINKING_END if self.in_thinking else THINKING_START
+
+    def feed(self, text):
+        self._buffer += text
+        parts = []
+        while self._buffer:
+            tag = self._pending_tag()
+            index = self._buffer.find(tag)
+            if index >= 0:
+                if index:
+                    parts.append((self._kind(), self._buffer[:index]))
+                self._buffer = self._buffer[index + len(tag):]
+                self.in_thinking = not self.in_thinking
+                continue
+
+            # Hold back a suffix that might be the start of the tag.
+            keep = 0
+            for size in range(min(len(tag) - 1, len(self._buffer)), 0, -1):
+                if tag.startswith(self._buffer[-size:]):
+                    keep = size
+                    break
+            emit = self._buffer[:len(self._buffer) - keep]
+            if emit:
+                parts.append((self._kind(), emit))
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            break
+        return parts
+
+    def close(self):
+        parts = [(self._kind(), self._buffer)] if self._buffer else []
+        self._buffer = ""
+        return parts
+
+    def _kind(self):
+        return "thinking" if self.in_thinking else "answer"
+
+
+def split_thinking(text):
+    """(thinking, answer) of a complete response.
+
+    A response without both tags (e.g. cut off inside the reasoning) is all answer.
+    """
+    if THINKING_START not in text or THINKING_END not in text:
+        return "", text
+    parser = ThinkingStreamParser()
+    parts = parser.feed(text) + parser.close()
+    thinking = "".join(part for kind, part in parts if kind == "thinking")
+    answer = "".join(part for kind, part in parts if kind == "answer")
+    return thinking.strip(), answer.strip()
+
+
+class _TurnEvents:
+    """Turns the (chunk, metadata) pairs of stream_mode="messages" into UI events."""
+
+    def __init__(self):
+        self.parser = ThinkingStreamParser()
+        self.message_id = None
+        self.raw = ""
+
+    def feed(self, chunk, metadata):
+        if metadata.get("langgraph_node") != "agent" or not isinstance(chunk, AIMessageChunk):
+            return
+
+        if chunk.id != self.message_id:
+            if self.message_id is not None:
+                yield from self.parser.close()
+                yield "new_message", None
+            self.message_id = chunk.id
+            self.parser = ThinkingStreamParser()
+            self.raw = ""
+
+        for tool_chunk in chunk.tool_call_chunks:
+            if tool_chunk.get("name"):
+                yield "tool", tool_chunk["name"]
+
+        if isinstance(chunk.content, str) and chunk.content:
+            self.raw += chunk.content
+            yield from self.parser.feed(chunk.content)
+
+    def close(self):
+        yield from self.parser.close()
+        yield "done", self.raw
+
+
+def stream_turn(agent, inputs, config):
+    """Yield (event, value) pairs for one turn, as tokens arrive.
+
+    Events:
+        ("tool", name): the model decided to call tool `name`.
+        ("new_message", None): a new model message started; answer text
+            shown so far belonged to an intermediate step.
+        ("thinking", text) / ("answer", text): streamed text.
+        ("done", raw_content): raw content of the final model message,
+            including any thinking tags, as it is stored in the history.
+    """
+    events = _TurnEvents()
+    for chunk, metadata in agent.stream(inputs, config, stream_mode="messages"):
+        yield from events.feed(chunk, metadata)
+    yield from events.close()
+
+
+async def astream_turn(agent, inputs, config):
+    """Async variant of `stream_turn`, built on `agent.astream`.
+
+    Tool calls of one model message then run concurrently on the event loop.
+    """
+    events = _TurnEvents()
+    async for chunk, metadata in agent.astream(inputs, config, stream_mode="messages"):
+        for event in events.feed(chunk, metadata):
+            yield event
+    for event in events.close():
+        yield event
+
+
+class EventLoopThread:
+    """An asyncio event loop running in a daemon thread.
+
+    Lets synchronous code (the Streamlit script) drive coroutines and async
+    generators. A single long-lived loop is used rather than one per call,
+    because async HTTP clients such as ChatGroq's are bound to the loop they
+    first ran on.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="agent-event-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine):
+        """Run `coroutine` on the loop and return its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def iterate(self, async_iterator):
+        """Iterate an async iterator from synchronous code."""
+        try:
+            while True:
+                try:
+                    yield self.run(async_iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Closes the generator (and the agent run) when the caller stops early.
+            self.run(async_iterator.aclose())
@@ -0,0 +1,343 @@
+"""In-process latency, token and cache metrics.
+
+- `span(name)` times a block, `observe(name, seconds)` records a duration
+  measured elsewhere and `count(name)` bumps a counter.
+- `TurnTracer` is a LangChain callback handler passed in the run config of
+  one question. It times the agent and tools nodes, every model call (with
+  its token usage), tool and retriever run, and records the whole turn when
+  `finish()` is called.
+- `register(name, stats)` adds a function returning a dict of gauges (cache
+  hit rates, checkpointer size, ...), read whenever metrics are exported.
+
+Every recorded span and turn is appended to FITAI_TELEMETRY_JSONL when it is
+set. `prometheus_text()` renders the metrics in the Prometheus text format;
+`serve_prometheus()` serves it on /metrics (FITAI_TELEMETRY_PORT), as does
+the index server.
+"""
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import settings
+
+# Durations kept per span name for percentiles, and finished turns kept for the debug panel.
+WINDOW = 1024
+RECENT_TURNS = 20
+
+
+class Timing:
+    """Count, total and maximum of a span, plus a window of recent durations."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def quantile(self, q):
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self.sources = {}
+        self.turns = deque(maxlen=RECENT_TURNS)
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._file = None
+
+    def observe(self, name, seconds, **attributes):
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.add(seconds)
+        self.export({"type": "span", "name": name, "ms": seconds * 1000, **attributes})
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_turn(self, record):
+        with self._lock:
+            self.turns.append(record)
+        self.export({"type": "turn", **record})
+
+    def export(self, record):
+        if not settings.TELEMETRY_JSONL:
+            return
+        line = json.dumps({"ts": time.time(), **record}, default=str)
+        with self._export_lock:
+            if self._file is None:
+                self._file = open(settings.TELEMETRY_JSONL, "a", buffering=1)
+            self._file.write(line + "\n")
+
+    def gauges(self):
+        gauges = {}
+        for name, stats in list(self.sources.items()):
+            try:
+                gauges[name] = stats()
+            except Exception as e:
+                gauges[name] = {"error": str(e)}
+        return gauges
+
+    def snapshot(self):
+        with self._lock:
+            timings = {name: timing.summary() for name, timing in self.timings.items()}
+            counters = dict(self.counters)
+            turns = list(self.turns)
+        return {"timings": timings, "counters": counters, "gauges": self.gauges(), "turns": turns}
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as `name`."""
+    if not settings.TELEMETRY_ENABLED:
+        yield
+        return
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe(name, time.perf_counter() - began, **attributes)
+
+
+def observe(name, seconds, **attributes):
+    if settings.TELEMETRY_ENABLED:
+        METRICS.observe(name, seconds, **attributes)
+
+
+def count(name, value=1):
+    if settings.TELEMETRY_ENABLED:
+        METRICS.count(name, value)
+
+
+def register(name, stats):
+    """Export the dict returned by `stats()` as gauges under `name`."""
+    METRICS.sources[name] = stats
+
+
+def snapshot():
+    return METRICS.snapshot()
+
+
+class TurnTracer(BaseCallbackHandler):
+    """Collects the spans, token usage and tool calls of one question.
+
+    Pass it in the run config (``config["callbacks"]``) and call `finish()`
+    once the turn has been streamed.
+    """
+
+    # Handlers are called inline, so the timings do not include executor hops.
+    run_inline = True
+
+    def __init__(self, thread_id=None):
+        self.thread_id = thread_id
+        self.began = time.perf_counter()
+        self.spans = {}
+        self.model_calls = 0
+        self.tool_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.retrieval_cache_hits = 0
+        self._runs = {}
+        self._open_nodes = set()
+        self._tools_with_search = set()
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, name, key=None):
+        with self._lock:
+            self._runs[run_id] = (name, time.perf_counter(), key)
+
+    def _end(self, run_id):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return None
+            name, began, key = run
+            self._open_nodes.discard(key)
+            seconds = time.perf_counter() - began
+            total = self.spans.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+        observe(name, seconds)
+        return name
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node is None or kwargs.get("name") != node:
+            return
+        # The node's runnable and what it wraps share its name; time the outermost.
+        key = (node, metadata.get("langgraph_step"), metadata.get("langgraph_checkpoint_ns"))
+        with self._lock:
+            if key in self._open_nodes:
+                return
+            self._open_nodes.add(key)
+        self._start(run_id, f"node.{node}", key)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        if self._end(run_id) is None:
+            return
+        message = getattr(response.generations[0][0], "message", None) if response.generations else None
+        usage = getattr(message, "usage_metadata", None) or {}
+        with self._lock:
+            self.model_calls += 1
+            self.input_tokens += usage.get("input_tokens", 0)
+            self.output_tokens += usage.get("output_tokens", 0)
+            self.tool_calls += len(getattr(message, "tool_calls", None) or [])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, f"tool.{(serialized or {}).get('name') or kwargs.get('name', 'tool')}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        if self._end(run_id) is None:
+            return
+        with self._lock:
+            # A retriever tool that did not search was served from the retrieval cache.
+            if run_id not in self._tools_with_search:
+                self.retrieval_cache_hits += 1
+            self._tools_with_search.discard(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            if parent_run_id in self._runs and self._runs[parent_run_id][0] == "retriever":
+                return  # time only the outermost retriever (re-ranking wraps hybrid)
+            self._tools_with_search.add(parent_run_id)
+        self._start(run_id, "retriever")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def finish(self, answer_cache_hit=False):
+        """Record the turn and return its record."""
+        seconds = time.perf_counter() - self.began
+        with self._lock:
+            record = {
+                "thread_id": self.thread_id,
+                "ms": seconds * 1000,
+                "answer_cache_hit": answer_cache_hit,
+                "model_calls": self.model_calls,
+                "tool_calls": self.tool_calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "retrieval_cache_hits": self.retrieval_cache_hits,
+                "spans": {name: {"count": n, "ms": total * 1000} for name, (n, total) in self.spans.items()},
+            }
+        if settings.TELEMETRY_ENABLED:
+            METRICS.observe("turn", seconds)
+            for name in ("model_calls", "tool_calls", "input_tokens", "output_tokens", "retrieval_cache_hits"):
+                METRICS.count(name, record[name])
+            METRICS.count("turns")
+            METRICS.count("answer_cache_hits", int(answer_cache_hit))
+            METRICS.record_turn(record)
+        return record
+
+
+# --- Prometheus ---
+
+def _metric_name(*parts):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(["fitai", *parts]))
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(data=None):
+    """Metrics in the Prometheus text exposition format."""
+    data = data or snapshot()
+    lines = ["# TYPE fitai_span_seconds summary"]
+    for name, timing in sorted(data["timings"].items()):
+        label = f'span="{_label(name)}"'
+        lines.append(f'fitai_span_seconds{{{label},quantile="0.5"}} {timing["p50_ms"] / 1000:.6f}')
+        lines.append(f'fitai_span_seconds{{{label},quantile="0.95"}} {timing["p95_ms"] / 1000:.6f}')
+        lines.append(f"fitai_span_seconds_sum{{{label}}} {timing['total_s']:.6f}")
+        lines.append(f"fitai_span_seconds_count{{{label}}} {timing['count']}")
+    for name, value in sorted(data["counters"].items()):
+        metric = _metric_name(name, "total")
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for source, gauges in sorted(data["gauges"].items()):
+        for key, value in sorted(gauges.items()):
+            metric = _metric_name(source, key)
+            if isinstance(value, dict):
+                # e.g. the query batch-size histogram: one series per bucket
+                series = [(f'{{key="{_label(k)}"}}', v) for k, v in value.items()]
+            else:
+                series = [("", value)]
+            series = [(labels, v) for labels, v in series if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if series:
+                lines.append(f"# TYPE {metric} gauge")
+                lines += [f"{metric}{labels} {v}" for labels, v in series]
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_prometheus(port=None, host=None):
+    """Serve /metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host or settings.TELEMETRY_HOST, port or settings.TELEMETRY_PORT), PrometheusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="telemetry-metrics", daemon=True).start()
+    return server
@@ -20,11 +20,21 @@ TRANSLATIONS = {
         "total_messages": "Toplam Mesaj",
         "your_questions": "Sorularınız",
         "clear_chat": "🗑️ Sohbeti Temizle",
+        "debug_panel": "🔧 Performans Metrikleri",
+        "debug_last_turn": "Son soru",
+        "debug_spans": "Süreler",
+        "debug_gauges": "Önbellekler ve bellek",
         "powered_by": "Powered by Groq & LangGraph",
         "loading_kb": "📚 Bilgi tabanı yükleniyor...",
         "no_pdfs": "⚠️ data/fitness_pdfs/ klasöründe PDF bulunamadı!",
         "pdfs_loaded": "✅ {count} PDF yüklendi!",
+        "index_not_built": "⚠️ Bilgi tabanı indeksi bulunamadı! Önce `python build_index.py` çalıştırın.",
         "vectorstore_error": "❌ Vector store hatası: {error}",
+        "kb_status_loading": "⏳ Bilgi tabanı hazırlanıyor... ({seconds:.0f} sn)",
+        "kb_status_idle": "💤 Bilgi tabanı ilk soruda yüklenecek",
+        "kb_status_ready": "📚 Bilgi tabanı hazır ({seconds:.1f} sn)",
+        "kb_status_empty": "⚠️ Bilgi tabanı boş",
+        "kb_status_failed": "❌ Bilgi tabanı yüklenemedi: {error}",
         "retriever_desc": "Fitness ve beslenme bilgilerini içeren PDF'lerden arama yapar. Kullan: egzersiz, beslenme, protein, antrenman soruları için.",
         "system_prompt": """Sen profesyonel bir fitness koçu ve beslenme uzmanısın.
 
@@ -55,6 +65,7 @@ KURALLAR:
         "q4_text": "Günlük kaç protein almalıyım?",
         "thinking": "💭 Düşünüyorum...",
         "agent_error": "❌ Agent oluşturulamadı.",
+        "error_no_response": "⚠️ Bir hata oluştu, cevap üretilemedi.",
         "welcome": "👋 **Hoş Geldiniz!** Yukarıdaki örnek sorulardan birini seçin veya aşağıya kendi sorunuzu yazın.",
         "memory_info": """🧠 **LangGraph Checkpoint Memory Aktif!**
     
@@ -87,6 +98,7 @@ gibi takip soruları anlıyorum! 🎯""",
         "default_custom_prompt": "Sen yardımsever bir koçsun.",
         "style_reasoning": "Mantık Yürütme",
         "thinking_process": "Düşünme Süreci",
+        "show_earlier": "⬆️ Önceki {count} mesajı göster",
         "thinking_process_streaming": "🧠 Düşünme Süreci...",
         "thinking_complete": "✅ Düşünme Tamamlandı!",
         "reasoning_streaming": "🤔 Mantık Yürütülüyor...",
@@ -114,11 +126,21 @@ gibi takip soruları anlıyorum! 🎯""",
         "total_messages": "Total Messages",
         "your_questions": "Your Questions",
         "clear_chat": "🗑️ Clear Chat",
+        "debug_panel": "🔧 Performance Metrics",
+        "debug_last_turn": "Last question",
+        "debug_spans": "Timings",
+        "debug_gauges": "Caches and memory",
         "powered_by": "Powered by Groq & LangGraph",
         "loading_kb": "📚 Loading knowledge base...",
         "no_pdfs": "⚠️ No PDFs found in data/fitness_pdfs/ folder!",
         "pdfs_loaded": "✅ {count} PDFs loaded!",
+        "index_not_built": "⚠️ Knowledge base index not found! Run `python build_index.py` first.",
         "vectorstore_error": "❌ Vector store error: {error}",
+        "kb_status_loading": "⏳ Preparing knowledge base... ({seconds:.0f}s)",
+        "kb_status_idle": "💤 Knowledge base loads with the first question",
+        "kb_status_ready": "📚 Knowledge base ready ({seconds:.1f}s)",
+        "kb_status_empty": "⚠️ Knowledge base is empty",
+        "kb_status_failed": "❌ Knowledge base failed to load: {error}",
         "retriever_desc": "Searches fitness and nutrition information from PDFs. Use for: exercise, nutrition, protein, workout questions.",
         "system_prompt": """You are a professional fitness coach and nutrition expert.
 
@@ -149,6 +171,7 @@ RULES:
         "q4_text": "How much protein should I consume daily?",
         "thinking": "💭 Thinking...",
         "agent_error": "❌ Agent could not be created.",
+        "error_no_response": "⚠️ Something went wrong, no answer was generated.",
         "welcome": "👋 **Welcome!** Select one of the example questions above or type your own question below.",
         "memory_info": """🧠 **LangGraph Checkpoint Memory Active!**
     
@@ -181,6 +204,7 @@ I understand follow-up questions like these! 🎯""",
         "default_custom_prompt": "You are a helpful coach.",
         "style_reasoning": "Reasoning",
         "thinking_process": "Thinking Process",
+        "show_earlier": "⬆️ Show {count} earlier messages",
         "thinking_process_streaming": "🧠 Thinking Process...",
         "thinking_complete": "✅ Thinking Complete!",
         "reasoning_streaming": "🤔 Reasoning...",
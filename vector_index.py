@@ -0,0 +1,356 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+from collections import namedtuple
+from contextlib import nullcontext
+
+from langchain_core.documents import Document
+
+import ingest
+import settings
+import telemetry
+from hybrid_retrieval import BM25Index, HybridRetriever
+
+MANIFEST_FILE = "manifest.json"
+INDEX_SCHEMA = 3
+
+
+class KnowledgeBase(namedtuple("KnowledgeBase", ["vectorstore", "keyword_index", "manifest", "report"])):
+    """An opened index: vector store, BM25 index, manifest and the last sync report."""
+
+    @property
+    def doc_count(self):
+        return len(self.manifest["files"])
+
+    @property
+    def version(self):
+        return index_version(self.manifest)
+
+
+def list_pdfs(pdf_dir=settings.PDF_DIR):
+    return sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_settings():
+    """Settings that change the content of the index when they change."""
+    values = {
+        "chunk_size": settings.CHUNK_SIZE,
+        "chunk_overlap": settings.CHUNK_OVERLAP,
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "dedup": (
+            [settings.DEDUP_FURNITURE_SHARE, settings.DEDUP_SIMHASH_DISTANCE]
+            if settings.DEDUP_ENABLED else None
+        ),
+        # Bumped when the stored chunk format changes (2: chunk_id in metadata,
+        # 3: start_index in metadata)
+        "schema": INDEX_SCHEMA,
+    }
+    # Only non-default backends are part of the key, so existing Chroma
+    # indexes keep their directory.
+    if settings.VECTOR_BACKEND != "chroma":
+        values["vector_backend"] = settings.VECTOR_BACKEND
+    return values
+
+
+def index_key():
+    """Index directory name. The PDFs themselves are tracked by the manifest."""
+    return hashlib.sha256(json.dumps(index_settings(), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def index_path():
+    return os.path.join(settings.INDEX_DIR, index_key())
+
+
+def corpus_fingerprint(pdf_paths=None):
+    """Cheap (stat-only) fingerprint, used to notice that a sync is needed."""
+    pdf_paths = list_pdfs() if pdf_paths is None else pdf_paths
+    digest = hashlib.sha256()
+    for path in pdf_paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def get_embeddings():
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    if settings.EMBED_THREADS > 0:
+        import torch
+
+        torch.set_num_threads(settings.EMBED_THREADS)
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        encode_kwargs={"batch_size": settings.EMBED_BATCH_SIZE},
+    )
+    if settings.EMBED_QUERY_BATCHING:
+        from embedding_batcher import MicroBatchingEmbeddings
+
+        embeddings = MicroBatchingEmbeddings(
+            embeddings,
+            max_batch=settings.EMBED_QUERY_MAX_BATCH,
+            max_wait=settings.EMBED_QUERY_MAX_WAIT_MS / 1000,
+        )
+    return embeddings
+
+
+# --- Manifest ---
+
+def load_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    # Write-then-rename so a crash never leaves a truncated manifest behind.
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def plan_sync(manifest, pdf_paths):
+    """Compare the PDFs on disk with the manifest.
+
+    Returns (to_add, to_remove, unchanged) where `to_add` maps file name to its
+    fresh stat/hash entry and `to_remove` lists manifest file names whose chunks
+    must be deleted (removed files and changed files).
+    """
+    known = manifest["files"]
+    to_add, to_remove, unchanged = {}, [], []
+
+    for path in pdf_paths:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        entry = known.get(name)
+
+        # Size and mtime unchanged: trust the stored hash instead of re-reading the file.
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            unchanged.append(name)
+            continue
+
+        sha256 = file_sha256(path)
+        if entry and entry["sha256"] == sha256:
+            # Touched but identical; only the stat info needs refreshing.
+            entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime_ns
+            unchanged.append(name)
+            continue
+
+        if entry:
+            to_remove.append(name)
+        to_add[name] = {
+            "path": path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "sha256": sha256,
+            "chunk_ids": [],
+        }
+
+    on_disk = {os.path.basename(p) for p in pdf_paths}
+    to_remove.extend(name for name in known if name not in on_disk)
+    return to_add, to_remove, unchanged
+
+
+# --- Index ---
+
+def open_vectorstore(path, embeddings=None):
+    embeddings = embeddings or get_embeddings()
+    if settings.VECTOR_BACKEND == "numpy":
+        from numpy_store import NumpyVectorStore
+
+        return NumpyVectorStore(
+            path,
+            embeddings,
+            index=settings.NUMPY_INDEX,
+            nprobe=settings.NUMPY_IVF_NPROBE,
+            int8=settings.NUMPY_INT8,
+        )
+    if settings.VECTOR_BACKEND != "chroma":
+        raise ValueError(f"Unknown vector backend: {settings.VECTOR_BACKEND!r}")
+
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(
+        persist_directory=path,
+        embedding_function=embeddings,
+    )
+
+
+def add_in_batches(vectorstore, chunks, ids, batch_size=None):
+    """Embed and write `chunks` a fixed-size batch at a time.
+
+    `add_documents` embeds everything it is given in one call, so passing a
+    whole file at once would hold all of its texts and vectors in memory.
+    """
+    batch_size = batch_size or settings.EMBED_BATCH_SIZE
+    for start in range(0, len(chunks), batch_size):
+        vectorstore.add_documents(
+            chunks[start:start + batch_size],
+            ids=ids[start:start + batch_size],
+        )
+
+
+def open_keyword_index(vectorstore, path, manifest):
+    """Load the BM25 index, rebuilding it from the vector store if it is out of date."""
+    keyword_index = BM25Index.load(path)
+    expected = {chunk_id for entry in manifest["files"].values() for chunk_id in entry["chunk_ids"]}
+    if keyword_index is not None and set(keyword_index.docs) == expected:
+        return keyword_index
+
+    keyword_index = BM25Index()
+    stored = vectorstore.get(include=["documents", "metadatas"])
+    keyword_index.add(stored["ids"], [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(stored["documents"], stored["metadatas"])
+    ])
+    keyword_index.remove(set(keyword_index.docs) - expected)
+    return keyword_index
+
+
+def sync_index(vectorstore, keyword_index, manifest, path, pdf_paths):
+    """Bring the index in line with `pdf_paths`, embedding only what changed."""
+    to_add, to_remove, unchanged = plan_sync(manifest, pdf_paths)
+    report = {
+        "added": sorted(n for n in to_add if n not in to_remove),
+        "changed": sorted(n for n in to_add if n in to_remove),
+        "removed": sorted(n for n in to_remove if n not in to_add),
+        "unchanged": len(unchanged),
+        "chunks_added": 0,
+        "chunks_deleted": 0,
+    }
+
+    # Chroma writes through, so the manifest is saved after every file and an
+    # interrupted sync resumes where it stopped. The NumPy store writes its
+    # files once, when the batch ends; the manifest and keyword index are
+    # saved after that, so they never list chunks the store has not written.
+    batch_writes = getattr(vectorstore, "batch_writes", None)
+    write_through = batch_writes is None
+    with nullcontext() if write_through else batch_writes():
+        for name in to_remove:
+            chunk_ids = manifest["files"][name]["chunk_ids"]
+            if chunk_ids:
+                vectorstore.delete(ids=chunk_ids)
+                keyword_index.remove(chunk_ids)
+            report["chunks_deleted"] += len(chunk_ids)
+            del manifest["files"][name]
+            if write_through:
+                keyword_index.save(path)
+                save_manifest(path, manifest)
+
+        report["timings"] = {}
+        report["dedup"] = {"furniture_lines": 0, "exact_duplicates": 0, "near_duplicates": 0}
+        paths = {entry.pop("path"): name for name, entry in to_add.items()}
+        for pdf_path, chunks, stats in ingest.iter_file_chunks(list(paths)):
+            name = paths[pdf_path]
+            entry = to_add[name]
+            report["timings"][name] = stats
+            telemetry.observe("index.parse", stats["wall_seconds"], file=name)
+            for key in report["dedup"]:
+                report["dedup"][key] += stats[key]
+            # Chunk IDs derive from the file name and content hash, so re-adding a
+            # file after a crash overwrites its old chunks instead of duplicating them.
+            prefix = hashlib.sha256(f"{name}:{entry['sha256']}".encode()).hexdigest()[:16]
+            entry["chunk_ids"] = [f"{prefix}-{i}" for i in range(len(chunks))]
+            for chunk, chunk_id in zip(chunks, entry["chunk_ids"]):
+                chunk.metadata["chunk_id"] = chunk_id
+            with telemetry.span("index.embed", file=name, chunks=len(chunks)):
+                add_in_batches(vectorstore, chunks, entry["chunk_ids"])
+            keyword_index.add(entry["chunk_ids"], chunks)
+            report["chunks_added"] += len(chunks)
+            manifest["files"][name] = entry
+            if write_through:
+                keyword_index.save(path)
+                save_manifest(path, manifest)
+
+    if not write_through:
+        keyword_index.save(path)
+    # Also persists refreshed stat info of touched-but-identical files.
+    save_manifest(path, manifest)
+    return manifest, report
+
+
+def load_index(embeddings=None, sync=True, rebuild=False):
+    """Return the KnowledgeBase for the current corpus, or None.
+
+    With `sync=False` the index is only opened, never written; None is
+    returned when there are no PDFs or (read-only) when no index has been
+    built. `rebuild=True` discards the existing index and embeds everything
+    again.
+    """
+    pdf_paths = list_pdfs()
+    if not pdf_paths:
+        return None
+
+    path = index_path()
+    if rebuild:
+        shutil.rmtree(path, ignore_errors=True)
+    if not sync:
+        manifest = load_manifest(path)
+        if manifest is None:
+            return None
+        vectorstore = open_vectorstore(path, embeddings)
+        return KnowledgeBase(vectorstore, open_keyword_index(vectorstore, path, manifest), manifest, None)
+
+    os.makedirs(path, exist_ok=True)
+    vectorstore = open_vectorstore(path, embeddings)
+    manifest = load_manifest(path) or {"settings": index_settings(), "files": {}}
+    keyword_index = open_keyword_index(vectorstore, path, manifest)
+    manifest, report = sync_index(vectorstore, keyword_index, manifest, path, pdf_paths)
+    return KnowledgeBase(vectorstore, keyword_index, manifest, report)
+
+
+def make_retriever(knowledge_base, k=None, reranker=None):
+    """Retriever over `knowledge_base` as configured by FITAI_RETRIEVAL_MODE.
+
+    With FITAI_RERANK=1 the retriever over-fetches candidates and re-ranks
+    them with `reranker` (a CrossEncoderReranker is created if none is given).
+    """
+    k = k or settings.RETRIEVAL_K
+    candidates = max(settings.RERANK_FETCH_K, k) if settings.RERANK_ENABLED else k
+    if settings.RETRIEVAL_MODE == "dense":
+        retriever = knowledge_base.vectorstore.as_retriever(search_kwargs={"k": candidates})
+    else:
+        retriever = HybridRetriever(
+            vectorstore=knowledge_base.vectorstore,
+            keyword_index=knowledge_base.keyword_index,
+            k=candidates,
+            fetch_k=max(settings.RETRIEVAL_FETCH_K, candidates),
+            rrf_k=settings.RETRIEVAL_RRF_K,
+        )
+    if not settings.RERANK_ENABLED:
+        return retriever
+
+    from reranking import CrossEncoderReranker, RerankingRetriever
+
+    return RerankingRetriever(
+        base_retriever=retriever,
+        reranker=reranker or CrossEncoderReranker(),
+        k=k,
+        budget_ms=settings.RERANK_BUDGET_MS,
+    )
+
+
+def manifest_chunk_count(manifest):
+    return sum(len(entry["chunk_ids"]) for entry in manifest["files"].values())
+
+
+def index_version(manifest):
+    """Changes whenever any chunk is added to or removed from the index."""
+    digest = hashlib.sha256(index_key().encode())
+    for name in sorted(manifest["files"]):
+        digest.update(f"{name}:{manifest['files'][name]['sha256']}".encode())
+    return digest.hexdigest()[:16]
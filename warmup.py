@@ -0,0 +1,163 @@
+"""Loads the knowledge base in a background thread, once per corpus version.
+
+`IndexWarmup.start()` begins loading (embedding model, then opening or
+syncing the index) in a daemon thread and returns a Future. Callers that
+arrive while it runs get the same Future instead of starting a second
+build; `get()` waits on it. Once a load has finished, the next `start()`
+only loads again if the corpus key changed (or the load failed); the key is
+checked at most once every `check_interval` seconds.
+
+`serve_health()` exposes the state over HTTP for orchestrators:
+
+    GET /healthz  200 while the process is up
+    GET /readyz   200 once the index is loaded, 503 before (or on failure)
+
+Only the standard library is imported here, so the warm-up can be started
+before the app has imported anything heavy.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWarmup:
+    """Shared background load of the knowledge base.
+
+    Args:
+        load: Returns the knowledge base, or None when there is nothing to
+            serve (no PDFs, or no index in read-only mode).
+        key: Returns the current corpus key (e.g. vector_index.corpus_fingerprint).
+            Called in the loading thread when the first load is started
+            with `refresh=False`, so the caller need not import its dependencies.
+        check_interval: Seconds during which a finished load is reused without
+            calling `key` again (it may stat every PDF or ask a server).
+    """
+
+    def __init__(self, load, key, check_interval=0.0):
+        self.load = load
+        self.key = key
+        self.check_interval = check_interval
+        self.started = None
+        self.finished = None
+        self._future = None
+        self._future_key = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, future):
+        return (
+            future.done()
+            and future.exception() is None
+            and self._checked is not None
+            and time.monotonic() - self._checked < self.check_interval
+        )
+
+    def start(self, refresh=True):
+        """Return the Future of the current load, starting one if needed.
+
+        A load still in progress is always shared. With `refresh=True`, a
+        finished load is repeated when the corpus key changed or it failed;
+        with `refresh=False`, any existing load is returned as is.
+        """
+        with self._lock:
+            future = self._future
+            if future is not None and (not refresh or not future.done() or self._fresh(future)):
+                return future
+        key = self.key() if refresh else None
+        with self._lock:
+            if refresh:
+                self._checked = time.monotonic()
+            future = self._future
+            if future is not None and (
+                not future.done() or (future.exception() is None and self._future_key == key)
+            ):
+                return future
+            future = self._future = Future()
+            self._future_key = key
+            self.started, self.finished = time.monotonic(), None
+        threading.Thread(target=self._run, args=(future, key), name="index-warmup", daemon=True).start()
+        return future
+
+    def _run(self, future, key):
+        try:
+            if key is None:
+                key = self.key()
+                with self._lock:
+                    if self._future is future:
+                        self._future_key = key
+                        self._checked = time.monotonic()
+            result = self.load()
+        except BaseException as e:
+            logger.exception("index warm-up failed")
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            self.finished = time.monotonic()
+            logger.info("index warm-up finished in %.1fs", self.finished - self.started)
+
+    def get(self, timeout=None):
+        """The knowledge base of the current corpus, waiting for it if needed."""
+        return self.start().result(timeout)
+
+    @property
+    def ready(self):
+        future = self._future
+        return future is not None and future.done() and future.exception() is None and future.result() is not None
+
+    def status(self):
+        """State ("idle", "loading", "ready", "empty" or "failed"), seconds and error."""
+        future = self._future
+        error = None
+        if future is None:
+            state = "idle"
+        elif not future.done():
+            state = "loading"
+        elif future.exception() is not None:
+            state, error = "failed", str(future.exception())
+        else:
+            state = "ready" if future.result() is not None else "empty"
+        seconds = None
+        if self.started is not None:
+            seconds = (self.finished or time.monotonic()) - self.started
+        return {"state": state, "seconds": seconds, "error": error}
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    warmup = None
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/readyz":
+            status = self.warmup.status()
+            self._send(200 if status["state"] == "ready" else 503, status)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve_health(warmup, port=None, host=None):
+    """Serve /healthz and /readyz for `warmup` from a daemon thread; returns the server."""
+    handler = type("WarmupHealthHandler", (HealthHandler,), {"warmup": warmup})
+    server = ThreadingHTTPServer((host or settings.HEALTH_HOST, port or settings.HEALTH_PORT), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="health", daemon=True).start()
+    return server